@@ -9,6 +9,7 @@ from django.contrib.auth import authenticate
 from rest_framework.permissions import IsAuthenticated
 from .models import User
 from django.db.models import Q
+from courses.cart import merge_anonymous_cart, clear_anonymous_cart
 
 class RegisterView(APIView):
     def post(self, request):
@@ -19,8 +20,11 @@ class RegisterView(APIView):
             # Generate JWT token
             refresh = RefreshToken.for_user(user)
             access_token = str(refresh.access_token)
-            
-            return Response({
+
+            # انتقال سبد خرید مهمان به سبد کاربر
+            cart_merged = merge_anonymous_cart(request, user)
+
+            response = Response({
                 "id": user.id,
                 "username": user.username,
                 "email": user.email,
@@ -28,6 +32,9 @@ class RegisterView(APIView):
                 "last_name": user.last_name,
                 "token": access_token  # Send the JWT access token
             }, status=status.HTTP_201_CREATED)
+            if cart_merged:
+                clear_anonymous_cart(response)
+            return response
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 class LoginView(APIView):
@@ -50,7 +57,10 @@ class LoginView(APIView):
 
         refresh = RefreshToken.for_user(user)
 
-        return Response({
+        # انتقال سبد خرید مهمان به سبد کاربر
+        cart_merged = merge_anonymous_cart(request, user)
+
+        response = Response({
             "id": user.id,
             "username": user.username,
             "email": user.email,
@@ -59,6 +69,9 @@ class LoginView(APIView):
             "access_token": str(refresh.access_token),
             "refresh_token": str(refresh)
         }, status=status.HTTP_200_OK)
+        if cart_merged:
+            clear_anonymous_cart(response)
+        return response
     
 # class LogoutView(APIView):
 #     def post(self, request):
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 from decouple import config
@@ -83,6 +85,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # دیتابیس تست روی فایل تا تست‌های هم‌زمانی (چند thread) واقعاً منتظر قفل بمونن؛
+        # دیتابیس حافظه‌ای با shared cache به‌جای انتظار خطای table is locked می‌ده.
+        # مسیر موقت و جدا برای هر اجرا تا فایل جامونده از اجرای قطع‌شده سؤال تعاملی نپرسه
+        'TEST': {
+            'NAME': Path(tempfile.gettempdir()) / f'teencomp_test_{os.getpid()}.sqlite3',
+        },
     }
 }
 
@@ -160,4 +168,7 @@ SIMPLE_JWT = {
 
 
 
-GEMINI_API_KEY = config('GEMINI_API_KEY')
\ No newline at end of file
+GEMINI_API_KEY = config('GEMINI_API_KEY')
+
+# کلید امضای callbackهای درگاه پرداخت
+PAYMENT_GATEWAY_SECRET = config('PAYMENT_GATEWAY_SECRET', default=SECRET_KEY)
\ No newline at end of file
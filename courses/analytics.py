@@ -0,0 +1,162 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import groupby
+
+from django.db.models import (
+    Case,
+    DecimalField,
+    F,
+    PositiveIntegerField,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from .models import CourseSalesRollup, DailySalesRollup, OrderItem
+
+CENT = Decimal("0.01")
+ROLLUP_REVENUE_FIELD = DecimalField(max_digits=14, decimal_places=2)
+# بازه‌ی مجاز گزارش؛ حداکثر چند صد ردیف rollup جمع زده می‌شه
+MAX_REPORT_DAYS = 366
+
+# ستون‌های هر آیتم سفارش که برای محاسبه‌ی rollup لازمه، مرتب بر اساس سفارش
+ROLLUP_ITEM_FIELDS = (
+    "order_id",
+    "order__created_at",
+    "order__total_amount",
+    "order__discount_code_id",
+    "course_id",
+    "course__price",
+)
+
+
+def paid_order_items(order_ids=None):
+    items = OrderItem.objects.filter(order__status="paid")
+    if order_ids is not None:
+        items = items.filter(order_id__in=order_ids)
+    return items.order_by("order_id", "id").values_list(*ROLLUP_ITEM_FIELDS)
+
+
+def _allocate(total, prices):
+    """
+    مبلغ سفارش رو به نسبت قیمت دوره‌ها بین آیتم‌ها تقسیم می‌کنه؛ باقی‌مونده‌ی گرد کردن
+    به آیتم آخر می‌رسه تا جمع دقیقاً برابر مبلغ سفارش باشه.
+    """
+    price_total = sum(prices, Decimal("0"))
+    shares = []
+    for price in prices[:-1]:
+        share = total / len(prices) if not price_total else total * price / price_total
+        shares.append(share.quantize(CENT, rounding=ROUND_HALF_UP))
+    shares.append(total - sum(shares, Decimal("0")))
+    return shares
+
+
+def accumulate_rollups(rows, daily=None, per_course=None):
+    """
+    ردیف‌های paid_order_items رو (به ترتیب سفارش) در دو dict جمع می‌کنه:
+    daily[date] = [orders, revenue, discounted_orders]
+    per_course[(date, course_id)] = [units, revenue, discounted_units]
+    """
+    daily = daily if daily is not None else defaultdict(lambda: [0, Decimal("0"), 0])
+    per_course = (
+        per_course if per_course is not None else defaultdict(lambda: [0, Decimal("0"), 0])
+    )
+
+    for _, items in groupby(rows, key=lambda row: row[0]):
+        items = list(items)
+        _, created_at, total, discount_code_id, _, _ = items[0]
+        date = timezone.localtime(created_at).date()
+        discounted = int(discount_code_id is not None)
+
+        day = daily[date]
+        day[0] += 1
+        day[1] += total
+        day[2] += discounted
+
+        shares = _allocate(total, [item[5] for item in items])
+        for item, share in zip(items, shares):
+            course = per_course[(date, item[4])]
+            course[0] += 1
+            course[1] += share
+            course[2] += discounted
+
+    return daily, per_course
+
+
+def record_paid_orders(order_ids):
+    """
+    سهم سفارش‌های تازه paid شده رو به rollupها اضافه می‌کنه؛ باید داخل همون تراکنشی
+    صدا زده بشه که وضعیت سفارش رو عوض می‌کنه تا هر سفارش دقیقاً یک بار شمرده بشه.
+    """
+    daily, per_course = accumulate_rollups(paid_order_items(order_ids))
+    if not daily:
+        return
+
+    # ردیف‌های نبود رو می‌سازه، بعد با UPDATE اتمی افزایش می‌ده (بدون خواندن مقدار قبلی)
+    DailySalesRollup.objects.bulk_create(
+        [DailySalesRollup(date=date) for date in daily], ignore_conflicts=True
+    )
+    CourseSalesRollup.objects.bulk_create(
+        [CourseSalesRollup(date=date, course_id=course_id) for date, course_id in per_course],
+        ignore_conflicts=True,
+    )
+    for date, (orders, revenue, discounted) in daily.items():
+        DailySalesRollup.objects.filter(date=date).update(
+            orders=F("orders") + orders,
+            revenue=F("revenue") + revenue,
+            discounted_orders=F("discounted_orders") + discounted,
+        )
+    # افزایش همه‌ی دوره‌های یک روز با یک UPDATE و CASE روی course_id، مستقل از تعداد دوره‌ها
+    by_date = defaultdict(dict)
+    for (date, course_id), values in per_course.items():
+        by_date[date][course_id] = values
+    for date, courses in by_date.items():
+        CourseSalesRollup.objects.filter(date=date, course_id__in=courses).update(
+            units=F("units") + _per_course(courses, 0, PositiveIntegerField()),
+            revenue=F("revenue") + _per_course(courses, 1, ROLLUP_REVENUE_FIELD),
+            discounted_units=F("discounted_units")
+            + _per_course(courses, 2, PositiveIntegerField()),
+        )
+
+
+def _per_course(courses, index, output_field):
+    return Case(
+        *[
+            When(course_id=course_id, then=Value(values[index], output_field=output_field))
+            for course_id, values in courses.items()
+        ],
+        output_field=output_field,
+    )
+
+
+def sales_report(date_from, date_to):
+    """
+    گزارش بازه‌ی [date_from, date_to] فقط از روی جدول‌های rollup.
+    """
+    days = list(
+        DailySalesRollup.objects.filter(date__range=(date_from, date_to))
+        .order_by("date")
+        .values("date", "orders", "revenue", "discounted_orders")
+    )
+    courses = list(
+        CourseSalesRollup.objects.filter(date__range=(date_from, date_to))
+        .values("course_id", title=F("course__title"))
+        .annotate(
+            units=Sum("units"),
+            revenue=Sum("revenue"),
+            discounted_units=Sum("discounted_units"),
+        )
+        .order_by("-revenue", "course_id")
+    )
+    return {
+        "from": date_from,
+        "to": date_to,
+        "totals": {
+            "orders": sum(day["orders"] for day in days),
+            "revenue": sum((day["revenue"] for day in days), Decimal("0")),
+            "discounted_orders": sum(day["discounted_orders"] for day in days),
+        },
+        "days": days,
+        "courses": courses,
+    }
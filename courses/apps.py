@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoursesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courses'
+
+    def ready(self):
+        # ثبت سیگنال‌های باطل‌سازی کش
+        from . import catalog, discounts, entitlements  # noqa: F401
@@ -0,0 +1,183 @@
+from decimal import Decimal
+
+from django.db.models import Exists, OuterRef, Sum
+
+from .models import Course, ShoppingCart
+
+# سبد خرید کاربران مهمان فقط در یک کوکی امضاشده نگه داشته می‌شه
+# و تا زمان لاگین هیچ نوشتنی در دیتابیس انجام نمی‌شه.
+ANONYMOUS_CART_COOKIE = "cart"
+ANONYMOUS_CART_SALT = "courses.cart"
+ANONYMOUS_CART_MAX_AGE = 60 * 60 * 24 * 30
+ANONYMOUS_CART_MAX_ITEMS = 200
+
+
+def read_anonymous_cart(request):
+    """
+    لیست id دوره‌های سبد مهمان رو از کوکی امضاشده می‌خونه.
+    کوکی نامعتبر یا دست‌کاری‌شده مثل سبد خالی در نظر گرفته می‌شه.
+    """
+    value = request.get_signed_cookie(
+        ANONYMOUS_CART_COOKIE,
+        default="",
+        salt=ANONYMOUS_CART_SALT,
+        max_age=ANONYMOUS_CART_MAX_AGE,
+    )
+    course_ids = []
+    for part in value.split(","):
+        if part.isdigit() and int(part) not in course_ids:
+            course_ids.append(int(part))
+    return course_ids[:ANONYMOUS_CART_MAX_ITEMS]
+
+
+def clear_anonymous_cart(response):
+    response.delete_cookie(ANONYMOUS_CART_COOKIE)
+
+
+def save_anonymous_cart(response, course_ids):
+    if not course_ids:
+        clear_anonymous_cart(response)
+        return
+    response.set_signed_cookie(
+        ANONYMOUS_CART_COOKIE,
+        ",".join(str(course_id) for course_id in course_ids),
+        salt=ANONYMOUS_CART_SALT,
+        max_age=ANONYMOUS_CART_MAX_AGE,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+def cart_queryset(request):
+    """
+    کوئری‌ست سبد خرید کاربر لاگین‌شده. برای مهمان‌ها خالیه چون سبدشون در کوکیه.
+    """
+    if request.user.is_authenticated:
+        return ShoppingCart.objects.filter(user=request.user)
+    return ShoppingCart.objects.none()
+
+
+def get_cart(request, anonymous_course_ids=None):
+    """
+    آیتم‌های سبد (همراه با course) و قیمت کل رو برمی‌گردونه.
+    حداکثر دو کوئری: یکی برای آیتم‌ها و یکی Sum سمت دیتابیس.
+    برای مهمان‌ها آیتم‌ها ShoppingCartهای ذخیره‌نشده هستن.
+    """
+    if not request.user.is_authenticated:
+        if anonymous_course_ids is None:
+            anonymous_course_ids = read_anonymous_cart(request)
+        if not anonymous_course_ids:
+            return [], Decimal("0")
+
+        # دوره‌ها قبلاً با یک کوئری لود شدن، پس جمع در پایتون کوئری اضافه نداره
+        courses = Course.objects.in_bulk(anonymous_course_ids)
+        items = [
+            ShoppingCart(course=courses[course_id])
+            for course_id in anonymous_course_ids
+            if course_id in courses
+        ]
+        return items, sum((item.course.price for item in items), Decimal("0"))
+
+    queryset = cart_queryset(request)
+    items = list(queryset.select_related("course").order_by("added_at", "id"))
+    if not items:
+        return items, Decimal("0")
+
+    total = queryset.aggregate(total=Sum("course__price"))["total"] or Decimal("0")
+    return items, total
+
+
+def bulk_add_to_cart(request, course_ids):
+    """
+    چند دوره رو با یک کوئری اعتبارسنجی و با یک bulk_create به سبد اضافه می‌کنه.
+    خروجی: (وضعیت هر id، لیست جدید سبد مهمان یا None برای کاربر لاگین‌شده)
+    وضعیت‌ها: added / already_in_cart / not_found / cart_full
+    """
+    statuses = {course_id: "not_found" for course_id in course_ids}
+
+    if request.user.is_authenticated:
+        # اعتبارسنجی و تشخیص تکراری‌ها در یک کوئری
+        courses = (
+            Course.objects.filter(id__in=course_ids)
+            .annotate(
+                in_cart=Exists(
+                    ShoppingCart.objects.filter(user=request.user, course=OuterRef("pk"))
+                )
+            )
+            .values_list("id", "in_cart")
+        )
+        new_items = []
+        for course_id, in_cart in courses:
+            if in_cart:
+                statuses[course_id] = "already_in_cart"
+            else:
+                statuses[course_id] = "added"
+                new_items.append(ShoppingCart(user=request.user, course_id=course_id))
+        ShoppingCart.objects.bulk_create(new_items, ignore_conflicts=True)
+        return statuses, None
+
+    cart_course_ids = read_anonymous_cart(request)
+    existing_ids = set(
+        Course.objects.filter(id__in=course_ids).values_list("id", flat=True)
+    )
+    for course_id in course_ids:
+        if course_id not in existing_ids:
+            continue
+        if course_id in cart_course_ids:
+            statuses[course_id] = "already_in_cart"
+        elif len(cart_course_ids) >= ANONYMOUS_CART_MAX_ITEMS:
+            statuses[course_id] = "cart_full"
+        else:
+            statuses[course_id] = "added"
+            cart_course_ids.append(course_id)
+    return statuses, cart_course_ids
+
+
+def bulk_remove_from_cart(request, course_ids):
+    """
+    چند دوره رو با یک DELETE از سبد حذف می‌کنه.
+    وضعیت‌ها: removed / not_in_cart
+    """
+    if request.user.is_authenticated:
+        queryset = cart_queryset(request).filter(course_id__in=course_ids)
+        in_cart = set(queryset.values_list("course_id", flat=True))
+        queryset.delete()
+        cart_course_ids = None
+    else:
+        cart_course_ids = read_anonymous_cart(request)
+        in_cart = set(cart_course_ids) & set(course_ids)
+        cart_course_ids = [c for c in cart_course_ids if c not in in_cart]
+
+    statuses = {
+        course_id: "removed" if course_id in in_cart else "not_in_cart"
+        for course_id in course_ids
+    }
+    return statuses, cart_course_ids
+
+
+def merge_anonymous_cart(request, user):
+    """
+    سبد مهمان رو بعد از لاگین یا ثبت‌نام با یک bulk insert به سبد کاربر اضافه می‌کنه.
+    True برمی‌گردونه اگر کوکی سبد وجود داشت و باید پاک بشه.
+    """
+    course_ids = read_anonymous_cart(request)
+    if not course_ids:
+        return False
+
+    # دوره‌های موجود که هنوز در سبد کاربر نیستن — یک کوئری
+    new_course_ids = (
+        Course.objects.filter(id__in=course_ids)
+        .exclude(shoppingcart__user=user)
+        .values_list("id", flat=True)
+    )
+    ShoppingCart.objects.bulk_create(
+        [ShoppingCart(user=user, course_id=course_id) for course_id in new_course_ids],
+        ignore_conflicts=True,
+    )
+    return True
+
+
+def apply_discount(total_price, discount):
+    if not discount:
+        return total_price
+    return total_price * (1 - discount.discount_percent / 100)
@@ -0,0 +1,58 @@
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Course
+from .serializers import CourseSerializer
+
+# کش پیش‌فرض (LocMemCache) مخصوص هر پروسه است و سیگنال باطل‌سازی فقط کش همون پروسه‌ای رو پاک می‌کنه
+# که دوره رو ذخیره کرده؛ بقیه‌ی workerها تا این TTL ممکنه داده‌ی قبلی (مثلاً قیمت قدیمی) نشون بدن،
+# پس TTL کوتاه نگه داشته شده. سبد خرید و checkout همیشه قیمت رو مستقیم از دیتابیس می‌خونن.
+CATALOG_CACHE_TIMEOUT = 60
+MAX_BATCH_IDS = 200
+
+
+def _course_cache_key(course_id):
+    return f"catalog:course:{course_id}"
+
+
+def get_course_data(course_id):
+    """
+    داده‌ی سریالایزشده‌ی یک دوره؛ اول از کش، در غیر این صورت از دیتابیس.
+    اگر دوره وجود نداشته باشه None برمی‌گردونه.
+    """
+    return get_courses_data([course_id]).get(course_id)
+
+
+def get_courses_data(course_ids):
+    """
+    داده‌ی چند دوره رو با یک get_many از کش و حداکثر یک کوئری id__in برمی‌گردونه.
+    خروجی یک dict از course_id به داده‌ی سریالایزشده است.
+    """
+    keys = {_course_cache_key(course_id): course_id for course_id in course_ids}
+    cached = cache.get_many(list(keys))
+    result = {keys[key]: data for key, data in cached.items()}
+
+    missing_ids = [course_id for course_id in course_ids if course_id not in result]
+    if missing_ids:
+        courses = Course.objects.filter(id__in=missing_ids)
+        fresh = {course.id: CourseSerializer(course).data for course in courses}
+        cache.set_many(
+            {_course_cache_key(course_id): data for course_id, data in fresh.items()},
+            CATALOG_CACHE_TIMEOUT,
+        )
+        result.update(fresh)
+
+    return result
+
+
+def invalidate_course(course_id):
+    # Course.objects.filter(...).update() سیگنال post_save نمی‌فرسته؛ بعد از به‌روزرسانی
+    # گروهی، این تابع باید برای دوره‌های تغییرکرده صریحاً صدا زده بشه.
+    cache.delete(_course_cache_key(course_id))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def _invalidate_course_on_change(sender, instance, **kwargs):
+    invalidate_course(instance.id)
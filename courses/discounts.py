@@ -0,0 +1,226 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.signals import post_save, post_delete
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import DiscountCode, DiscountRedemption, Order
+
+# کش داخل پروسه برای کدهای تخفیف. هر ورودی تا حداکثر DISCOUNT_CACHE_TTL معتبره
+# و زودتر از اولین مرز valid_from / valid_to منقضی می‌شه، پس وضعیت کد هیچ‌وقت کهنه نمی‌مونه.
+# با ذخیره یا حذف کد، ورودی همین پروسه فوراً پاک می‌شه؛ پروسه‌های دیگه حداکثر TTL عقب هستن.
+# کش LRU با سقف اندازه‌ست تا کدهای تصادفی (apply-discount برای مهمان‌ها هم بازه) حافظه رو پر نکنن.
+DISCOUNT_CACHE_TTL = timedelta(minutes=5)
+MISSING_CODE_CACHE_TTL = timedelta(seconds=30)
+DISCOUNT_CACHE_MAX_ENTRIES = 1024
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class DiscountCodeError(Exception):
+    pass
+
+
+def _expires_at(discount, now):
+    if discount is None:
+        return now + MISSING_CODE_CACHE_TTL
+
+    expires_at = now + DISCOUNT_CACHE_TTL
+    for boundary in (discount.valid_from, discount.valid_to):
+        if now < boundary < expires_at:
+            expires_at = boundary
+    return expires_at
+
+
+def _lookup(code, now):
+    with _lock:
+        entry = _cache.get(code)
+        if entry is not None and entry[1] > now:
+            _cache.move_to_end(code)
+            return entry[0]
+
+    discount = DiscountCode.objects.filter(code=code).first()
+    with _lock:
+        _cache[code] = (discount, _expires_at(discount, now))
+        _cache.move_to_end(code)
+        while len(_cache) > DISCOUNT_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return discount
+
+
+def resolve_discount_code(code):
+    """
+    کد تخفیف معتبر رو برمی‌گردونه یا DiscountCodeError با پیام مناسب می‌ده.
+    برای کدهای پرمصرف فقط یک کوئری در هر TTL به دیتابیس می‌زنه.
+    """
+    now = timezone.now()
+    discount = _lookup(code, now)
+
+    if discount is None:
+        raise DiscountCodeError("Invalid or expired discount code.")
+
+    if not discount.is_active:
+        raise DiscountCodeError("This discount code is not active.")
+
+    if discount.valid_from > now:
+        raise DiscountCodeError("This discount code is not valid yet.")
+
+    if discount.valid_to < now:
+        raise DiscountCodeError("This discount code has expired.")
+
+    return discount
+
+
+def redeem_discount_code(discount, user, order):
+    """
+    یک بار استفاده از کد رو ثبت می‌کنه؛ باید داخل transaction.atomic همراه با ساخت سفارش صدا زده بشه.
+    سقف کل با یک UPDATE شرطی (times_used < max_redemptions) اعمال می‌شه و هیچ قفلی
+    بین خواندن و نوشتن نگه داشته نمی‌شه. سقف هر کاربر با unique روی redemption_number.
+    """
+    if discount.per_user_limit is not None:
+        # شماره‌ی بعدی از بیشترین شماره گرفته می‌شه، چون redemption سفارش ناموفق آزاد می‌شه
+        # و شماره‌ها ممکنه پیوسته نباشن
+        used = DiscountRedemption.objects.filter(discount_code=discount, user=user).aggregate(
+            count=Count("id"), last=Max("redemption_number")
+        )
+        if used["count"] >= discount.per_user_limit:
+            raise DiscountCodeError("You have already used this discount code.")
+        try:
+            with transaction.atomic():
+                DiscountRedemption.objects.create(
+                    discount_code=discount,
+                    user=user,
+                    order=order,
+                    redemption_number=(used["last"] or 0) + 1,
+                )
+        except IntegrityError:
+            # درخواست هم‌زمان دیگه‌ای از همین کاربر همین شماره رو گرفته
+            raise DiscountCodeError("You have already used this discount code.")
+
+    # برای کدهای بدون سقف، ردیف کد اصلاً نوشته نمی‌شه تا روی کدهای پرمصرف رقابت نباشه
+    if discount.max_redemptions is not None:
+        updated = (
+            DiscountCode.objects.filter(pk=discount.pk)
+            .filter(Q(max_redemptions__isnull=True) | Q(times_used__lt=F("max_redemptions")))
+            .update(times_used=F("times_used") + 1)
+        )
+        if not updated:
+            raise DiscountCodeError("This discount code has reached its usage limit.")
+
+
+def release_discount_redemptions(order_ids):
+    """
+    استفاده‌ی ثبت‌شده‌ی کد تخفیف برای سفارش‌هایی که ناموفق شدن رو برمی‌گردونه:
+    ردیف DiscountRedemption حذف و times_used کم می‌شه. باید داخل همون transaction.atomic
+    که وضعیت سفارش رو عوض می‌کنه صدا زده بشه.
+    """
+    if not order_ids:
+        return
+    DiscountRedemption.objects.filter(order_id__in=order_ids).delete()
+
+    # times_used فقط برای کدهای سقف‌دار زیاد شده بود (redeem_discount_code)
+    released = (
+        Order.objects.filter(
+            id__in=order_ids,
+            discount_code__isnull=False,
+            discount_code__max_redemptions__isnull=False,
+        )
+        .values("discount_code_id")
+        .annotate(count=Count("id"))
+    )
+    for row in released:
+        DiscountCode.objects.filter(pk=row["discount_code_id"]).update(
+            times_used=Greatest(F("times_used") - row["count"], 0)
+        )
+
+
+# ۳۲ کاراکتر بدون حروف گیج‌کننده (0/O و 1/I)؛ چون 256 بر 32 بخش‌پذیره، بایت % 32 بایاس نداره
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+INSERT_BATCH_SIZE = 5000
+
+
+def _random_codes(count, prefix, length):
+    data = os.urandom(count * length)
+    return {
+        prefix + "".join(CODE_ALPHABET[b % 32] for b in data[i : i + length])
+        for i in range(0, count * length, length)
+    }
+
+
+def generate_discount_codes(count, prefix="", length=10, **fields):
+    """
+    count کد تصادفی یکتا می‌سازه و تکه‌تکه درج می‌کنه.
+    fields بقیه‌ی فیلدهای DiscountCode هستن (discount_percent، valid_from، ...).
+    لیست کدهای ساخته‌شده رو برمی‌گردونه.
+    """
+    codes = set()
+    while len(codes) < count:
+        codes |= _random_codes(count - len(codes), prefix, length)
+
+    connection = connections[DiscountCode.objects.db]
+    sql, prepared = _insert_statement(connection, fields)
+    code_list = list(codes)
+    created = []
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for i in range(0, len(code_list), INSERT_BATCH_SIZE):
+            chunk = code_list[i : i + INSERT_BATCH_SIZE]
+            while True:
+                try:
+                    with transaction.atomic(using=connection.alias):
+                        cursor.executemany(sql, [[code, *prepared] for code in chunk])
+                    break
+                except IntegrityError:
+                    # تداخل با کدهای قبلی دیتابیس (تقریباً غیرممکن در فضای 32^length)؛
+                    # فقط همین تکه بررسی و کدهای تکراری با کد تازه جایگزین می‌شن
+                    existing = set(
+                        DiscountCode.objects.filter(code__in=chunk).values_list("code", flat=True)
+                    )
+                    replacements = _random_codes(len(existing), prefix, length) - codes
+                    codes |= replacements
+                    chunk = [code for code in chunk if code not in existing] + list(replacements)
+            created.extend(chunk)
+
+    return created
+
+
+def _insert_statement(connection, fields):
+    # همه‌ی ردیف‌ها به‌جز code مقدار یکسان دارن، پس مقدارها فقط یک بار برای دیتابیس
+    # آماده می‌شن و درج با executemany انجام می‌شه؛ bulk_create برای هر ردیف
+    # همه‌ی فیلدها رو از نو prepare می‌کنه که برای صدها هزار کد چند برابر کندتره.
+    meta = DiscountCode._meta
+    values = {"is_active": True, "times_used": 0, **fields}
+    columns = ["code"] + list(values)
+    prepared = [
+        meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in values.items()
+    ]
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(meta.db_table),
+        ", ".join(connection.ops.quote_name(meta.get_field(name).column) for name in columns),
+        ", ".join(["%s"] * len(columns)),
+    )
+    return sql, prepared
+
+
+def invalidate_discount_code(code=None, discount_id=None):
+    with _lock:
+        _cache.pop(code, None)
+        if discount_id is not None:
+            # اگر کد تغییر نام داده باشه، ورودی قدیمی هم پاک بشه
+            for key, (discount, _) in list(_cache.items()):
+                if discount is not None and discount.id == discount_id:
+                    del _cache[key]
+
+
+@receiver(post_save, sender=DiscountCode)
+@receiver(post_delete, sender=DiscountCode)
+def _invalidate_discount_code_on_change(sender, instance, **kwargs):
+    invalidate_discount_code(instance.code, instance.id)
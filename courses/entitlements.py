@@ -0,0 +1,65 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import UserProgress
+
+# مجموعه‌ی id دوره‌هایی که هر کاربر بهشون دسترسی داره (ردیف UserProgress که با خرید ساخته می‌شه).
+# با fulfilment یا حذف دسترسی (refund) باطل می‌شه؛ TTL فقط یک محافظ اضافه است.
+# کش پیش‌فرض (LocMemCache) مخصوص هر پروسه است و باطل‌سازی worker پرداخت یا بقیه‌ی workerها
+# به این پروسه نمی‌رسه؛ پس نبودن id در مجموعه همیشه با دیتابیس دوباره چک می‌شه
+# (دسترسی تازه هیچ‌وقت رد نمی‌شه) و فقط دسترسی حذف‌شده ممکنه تا TTL باقی بمونه.
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60
+
+
+def _entitlement_cache_key(user_id):
+    return f"entitlements:user:{user_id}"
+
+
+def _load_entitled_course_ids(user):
+    course_ids = frozenset(
+        UserProgress.objects.filter(user=user).values_list("course_id", flat=True)
+    )
+    cache.set(_entitlement_cache_key(user.id), course_ids, ENTITLEMENT_CACHE_TIMEOUT)
+    return course_ids
+
+
+def get_entitled_course_ids(user, refresh=False):
+    """
+    frozenset از id دوره‌های کاربر؛ فقط در اولین درخواست بعد از هر تغییر به دیتابیس می‌ره.
+    با refresh=True مقدار کش نادیده گرفته و از دیتابیس دوباره ساخته می‌شه.
+    """
+    course_ids = None if refresh else cache.get(_entitlement_cache_key(user.id))
+    if course_ids is None:
+        course_ids = _load_entitled_course_ids(user)
+    return course_ids
+
+
+def has_course_access(user, course_id):
+    if not user.is_authenticated:
+        return False
+    if course_id in get_entitled_course_ids(user):
+        return True
+    # ممکنه دسترسی در پروسه‌ی دیگه‌ای داده شده باشه؛ یک exists و در صورت وجود، تازه‌سازی کش
+    if UserProgress.objects.filter(user=user, course_id=course_id).exists():
+        get_entitled_course_ids(user, refresh=True)
+        return True
+    return False
+
+
+def invalidate_entitlements(user_ids):
+    keys = [_entitlement_cache_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    # اگر داخل تراکنش باشیم، درخواستی هم‌زمان ممکنه قبل از commit مقدار قدیمی رو دوباره کش کنه
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+@receiver(post_save, sender=UserProgress)
+@receiver(post_delete, sender=UserProgress)
+def _invalidate_entitlements_on_change(sender, instance, created=True, **kwargs):
+    # ذخیره‌ی پیشرفت روی ردیف موجود مجموعه‌ی دوره‌ها رو عوض نمی‌کنه
+    if created:
+        invalidate_entitlements([instance.user_id])
@@ -0,0 +1,78 @@
+from accounts.models import User
+
+from .models import ChallengeAttempt, Order, UserContentProgress
+
+EXPORT_CHUNK_SIZE = 2000
+
+# هر خروجی: (کوئری‌ست، ستون‌ها). ستون‌ها فیلدهای values_list هستن؛ برای فیلدهای رابطه‌ای
+# عنوان ستون در CSV از EXPORT_HEADERS میاد.
+# فقط ستون‌های لازم خونده می‌شن و ردیف‌ها به‌جای مدل به‌صورت tuple ساخته می‌شن.
+EXPORTS = {
+    "orders": (
+        lambda: Order.objects.order_by("id"),
+        (
+            "id",
+            "user_id",
+            "user__email",
+            "status",
+            "total_amount",
+            "discount_code__code",
+            "created_at",
+        ),
+    ),
+    "users": (
+        lambda: User.objects.order_by("id"),
+        (
+            "id",
+            "username",
+            "email",
+            "first_name",
+            "last_name",
+            "is_active",
+            "date_joined",
+        ),
+    ),
+    "content-progress": (
+        lambda: UserContentProgress.objects.order_by("id"),
+        (
+            "id",
+            "user_id",
+            "content_id",
+            "content__section__course_id",
+            "watched_duration",
+            "total_duration",
+            "is_completed",
+            "updated_at",
+        ),
+    ),
+    "challenge-attempts": (
+        lambda: ChallengeAttempt.objects.order_by("id"),
+        (
+            "id",
+            "user_id",
+            "content_id",
+            "attempt_number",
+            "is_successful",
+            "submitted_at",
+        ),
+    ),
+}
+
+
+EXPORT_HEADERS = {
+    "user__email": "user_email",
+    "discount_code__code": "discount_code",
+    "content__section__course_id": "course_id",
+}
+
+
+def export_rows(name):
+    """
+    (سطر عنوان، iterator ردیف‌ها) برای خروجی name؛ ردیف‌ها تکه‌تکه از دیتابیس خونده می‌شن
+    پس حافظه مستقل از اندازه‌ی جدول ثابت می‌مونه. برای نام ناشناخته None.
+    """
+    if name not in EXPORTS:
+        return None
+    queryset, fields = EXPORTS[name]
+    rows = queryset().values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return [EXPORT_HEADERS.get(field, field) for field in fields], rows
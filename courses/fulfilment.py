@@ -0,0 +1,72 @@
+from django.db import transaction
+
+from .models import Order, OrderItem, UserProgress
+from .outbox import order_event, record_order_events
+from .entitlements import invalidate_entitlements
+from .analytics import record_paid_orders
+
+
+def create_order_items(order, course_ids):
+    OrderItem.objects.bulk_create(
+        [OrderItem(order=order, course_id=course_id) for course_id in course_ids]
+    )
+
+
+def grant_course_access(user_course_pairs):
+    # اگر کاربر قبلاً به دوره دسترسی داشته، ردیف قبلی (و پیشرفتش) دست نمی‌خوره
+    rows = [
+        UserProgress(user_id=user_id, course_id=course_id, completed=False)
+        for user_id, course_id in user_course_pairs
+    ]
+    UserProgress.objects.bulk_create(rows, ignore_conflicts=True)
+    # bulk_create سیگنال نمی‌فرسته، پس کش دسترسی‌ها صریحاً باطل می‌شه
+    invalidate_entitlements(row.user_id for row in rows)
+
+
+def revoke_course_access(user_id, course_ids):
+    """
+    دسترسی کاربر به دوره‌ها رو (مثلاً بعد از refund) با یک DELETE برمی‌داره.
+    """
+    UserProgress.objects.filter(user_id=user_id, course_id__in=course_ids).delete()
+    invalidate_entitlements([user_id])
+
+
+def fulfil_order(order, course_ids):
+    """
+    آیتم‌های سفارش و دسترسی کاربر به دوره‌ها رو با تعداد ثابتی کوئری می‌سازه
+    (مستقل از تعداد دوره‌ها). باید داخل transaction.atomic صدا زده بشه تا
+    سفارش پرداخت‌شده هیچ‌وقت با دسترسی ناقص باقی نمونه.
+    """
+    create_order_items(order, course_ids)
+    grant_course_access((order.user_id, course_id) for course_id in course_ids)
+
+
+def confirm_paid_orders(order_ids):
+    """
+    سفارش‌های pending رو paid می‌کنه و دسترسی همه‌ی آیتم‌هاشون رو یکجا می‌ده.
+    سفارش‌هایی که قبلاً paid/failed شدن نادیده گرفته می‌شن. id سفارش‌های تأییدشده رو برمی‌گردونه.
+    """
+    with transaction.atomic():
+        pending = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status="pending")
+            .values_list("id", "user_id", "total_amount")
+        )
+        if not pending:
+            return []
+
+        pending_ids = [order_id for order_id, _, _ in pending]
+        Order.objects.filter(id__in=pending_ids).update(status="paid")
+        record_order_events(
+            [
+                order_event("order.paid", order_id, user_id, total_amount, "paid")
+                for order_id, user_id, total_amount in pending
+            ]
+        )
+        record_paid_orders(pending_ids)
+        grant_course_access(
+            OrderItem.objects.filter(order_id__in=pending_ids).values_list(
+                "order__user_id", "course_id"
+            )
+        )
+    return pending_ids
@@ -0,0 +1,130 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "HTTP_IDEMPOTENCY_KEY"
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# درخواست تکراری هم‌زمان تا این مدت منتظر تموم شدن درخواست اول می‌مونه
+IDEMPOTENCY_WAIT_TIMEOUT = 10.0
+# کلیدی که بعد از این مدت هنوز تموم نشده رها شده حساب می‌شه (worker کشته شده یا timeout خورده)
+# و retry بعدی می‌تونه دوباره رزروش کنه؛ تا ۲۴ ساعت قفل نمی‌مونه
+IDEMPOTENCY_LEASE = timedelta(seconds=60)
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    payload = f"{request.method}:{request.path}:{body}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record):
+    response = Response(json.loads(record.response_body), status=record.response_status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(request, key, request_hash):
+    """
+    کلید رو برای این درخواست رزرو می‌کنه. خروجی (ردیف، رزرو شد یا نه)؛ اگر درخواست دیگه‌ای
+    همین کلید رو داشته باشه ردیف اون برمی‌گرده.
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user, key=key, request_hash=request_hash
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+            if record is None:
+                continue  # هم‌زمان حذف شد؛ دوباره تلاش کن
+            now = timezone.now()
+            expired = record.created_at < now - IDEMPOTENCY_KEY_TTL
+            abandoned = not record.is_completed and record.created_at < now - IDEMPOTENCY_LEASE
+            if expired or abandoned:
+                # شرط روی created_at تا اگر درخواست دیگه‌ای همزمان رزروش کرده، پاک نشه
+                IdempotencyKey.objects.filter(
+                    pk=record.pk, created_at=record.created_at
+                ).delete()
+                continue
+            return record, False
+
+
+def idempotent(handler):
+    """
+    دکوریتور برای متدهای APIView. اگر هدر Idempotency-Key فرستاده بشه:
+    - تکرار همون درخواست در مدت نگهداری، پاسخ ذخیره‌شده رو بدون اجرای دوباره برمی‌گردونه؛
+    - تکرار هم‌زمان منتظر درخواست اول می‌مونه به‌جای اجرای موازی؛
+    - استفاده از همون کلید با بدنه‌ی متفاوت رد می‌شه.
+    """
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return handler(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {"error": "Idempotency-Key is too long."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        request_hash = _request_hash(request)
+        record, claimed = _claim(request, key, request_hash)
+
+        if not claimed:
+            if record.request_hash != request_hash:
+                return Response(
+                    {"error": "Idempotency-Key was already used with a different request."},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+            while not record.is_completed and time.monotonic() < deadline:
+                time.sleep(IDEMPOTENCY_POLL_INTERVAL)
+                record = IdempotencyKey.objects.filter(pk=record.pk).first()
+                if record is None:
+                    # درخواست اول شکست خورد و کلید آزاد شد؛ این درخواست اجرا می‌شه
+                    return wrapper(self, request, *args, **kwargs)
+
+            if not record.is_completed:
+                return Response(
+                    {"error": "A request with this Idempotency-Key is still in progress."},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            return _replay(record)
+
+        # فقط ردیف خود این درخواست؛ اگر lease تموم شده و retry دیگه‌ای کلید رو گرفته، دست نمی‌خوره
+        own_record = IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at)
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            own_record.delete()
+            raise
+
+        if response.status_code >= 500:
+            # خطای سرور ذخیره نمی‌شه تا retry دوباره اجرا بشه
+            own_record.delete()
+            return response
+
+        own_record.update(
+            is_completed=True,
+            response_status=response.status_code,
+            response_body=JSONRenderer().render(response.data).decode(),
+        )
+        return response
+
+    return wrapper
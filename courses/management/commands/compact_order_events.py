@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.models import OrderEvent
+from courses.outbox import delivered_sequence
+
+
+class Command(BaseCommand):
+    help = "Delete order outbox events already acknowledged by every consumer."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Keep delivered events at least this long so consumers can replay them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sequence = delivered_sequence()
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        batch_size = options["batch_size"]
+        delivered = OrderEvent.objects.filter(id__lte=sequence, created_at__lt=cutoff)
+
+        total = 0
+        while True:
+            started = time.monotonic()
+            # حذف از قدیمی‌ترین id به بالا، هر بار یک batch کوتاه
+            ids = list(delivered.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+
+            deleted, _ = OrderEvent.objects.filter(id__in=ids).delete()
+            total += deleted
+            self.stdout.write(
+                f"Deleted {deleted} events up to #{ids[-1]} "
+                f"in {time.monotonic() - started:.3f}s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Compacted {total} events (delivered up to #{sequence}).")
+        )
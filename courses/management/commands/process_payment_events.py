@@ -0,0 +1,122 @@
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from courses.discounts import release_discount_redemptions
+from courses.fulfilment import confirm_paid_orders
+from courses.models import Order, PaymentEvent
+from courses.outbox import order_event, record_order_events
+from courses.payment_gateway import verify_signature
+
+
+class Command(BaseCommand):
+    help = "Verify queued payment gateway callbacks and fulfil paid orders in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the queue instead of exiting when it is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls when the queue is empty (with --loop).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total_processed, total_rejected = 0, 0
+
+        while True:
+            started = time.monotonic()
+            events = list(
+                PaymentEvent.objects.filter(status="pending").order_by("id")[:batch_size]
+            )
+            if not events:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+
+            processed, rejected = self._process_batch(events)
+            total_processed += processed
+            total_rejected += rejected
+            self.stdout.write(
+                f"Batch: {processed} processed, {rejected} rejected "
+                f"in {time.monotonic() - started:.3f}s"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Processed {total_processed} payment events, rejected {total_rejected}."
+            )
+        )
+
+    def _process_batch(self, events):
+        # سفارش‌های همه‌ی رویدادهای معتبر با یک کوئری
+        valid_ids = {e.id for e in events if verify_signature(e.payload, e.signature)}
+        order_ids = {e.payload.get("order_id") for e in events if e.id in valid_ids}
+        orders = Order.objects.in_bulk(
+            [order_id for order_id in order_ids if isinstance(order_id, int)]
+        )
+
+        paid_order_ids, failed_order_ids = set(), set()
+        for event in events:
+            event.status, event.error = "rejected", ""
+            if event.id not in valid_ids:
+                event.error = "Invalid signature."
+                continue
+
+            order = orders.get(event.payload.get("order_id"))
+            if order is None:
+                event.error = "Unknown order."
+                continue
+
+            try:
+                amount = Decimal(str(event.payload.get("amount")))
+            except InvalidOperation:
+                amount = None
+            if amount != order.total_amount:
+                event.error = "Amount does not match order total."
+                continue
+
+            event.status = "processed"
+            if event.payload.get("status") == "paid":
+                paid_order_ids.add(order.id)
+            else:
+                failed_order_ids.add(order.id)
+
+        now = timezone.now()
+        for event in events:
+            event.processed_at = now
+
+        with transaction.atomic():
+            confirm_paid_orders(paid_order_ids)
+            # پرداخت ناموفق فقط سفارشی رو که هنوز pending هست failed می‌کنه
+            failed = list(
+                Order.objects.select_for_update()
+                .filter(id__in=failed_order_ids - paid_order_ids, status="pending")
+                .values_list("id", "user_id", "total_amount")
+            )
+            failed_ids = [order_id for order_id, _, _ in failed]
+            Order.objects.filter(id__in=failed_ids).update(status="failed")
+            # سهم سفارش ناموفق از سقف کد تخفیف آزاد می‌شه
+            release_discount_redemptions(failed_ids)
+            record_order_events(
+                [
+                    order_event("order.failed", order_id, user_id, total_amount, "failed")
+                    for order_id, user_id, total_amount in failed
+                ]
+            )
+            PaymentEvent.objects.bulk_update(
+                events, ["status", "error", "processed_at"]
+            )
+
+        processed = sum(1 for e in events if e.status == "processed")
+        return processed, len(events) - processed
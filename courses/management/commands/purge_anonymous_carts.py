@@ -0,0 +1,84 @@
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from courses.models import ShoppingCart
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned anonymous carts and expired sessions in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to give writers room.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        batch_size = options["batch_size"]
+        pause = options["sleep"]
+
+        # ۱. سبدهای مهمان قدیمی (از ایندکس session_token, added_at استفاده می‌کنه)
+        carts = ShoppingCart.objects.filter(
+            session_token__isnull=False, added_at__lt=cutoff
+        ).order_by("session_token", "added_at")
+        total_carts, total_sessions = 0, 0
+        batch_number = 0
+        while True:
+            started = time.monotonic()
+            rows = list(carts.values_list("id", "session_token")[:batch_size])
+            if not rows:
+                break
+
+            session_tokens = {token for _, token in rows}
+            # هر batch یک تراکنش کوتاه جداگانه است تا قفل طولانی نگه داشته نشه
+            with transaction.atomic():
+                deleted_carts, _ = ShoppingCart.objects.filter(
+                    id__in=[cart_id for cart_id, _ in rows]
+                ).delete()
+                deleted_sessions, _ = Session.objects.filter(
+                    session_key__in=session_tokens
+                ).delete()
+
+            batch_number += 1
+            total_carts += deleted_carts
+            total_sessions += deleted_sessions
+            self.stdout.write(
+                f"Batch {batch_number}: {deleted_carts} carts, "
+                f"{deleted_sessions} sessions in {time.monotonic() - started:.3f}s"
+            )
+            if pause:
+                time.sleep(pause)
+
+        # ۲. sessionهای منقضی‌شده
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        while True:
+            started = time.monotonic()
+            keys = list(expired.values_list("session_key", flat=True)[:batch_size])
+            if not keys:
+                break
+
+            deleted_sessions, _ = Session.objects.filter(session_key__in=keys).delete()
+            batch_number += 1
+            total_sessions += deleted_sessions
+            self.stdout.write(
+                f"Batch {batch_number}: 0 carts, "
+                f"{deleted_sessions} sessions in {time.monotonic() - started:.3f}s"
+            )
+            if pause:
+                time.sleep(pause)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Purged {total_carts} carts and {total_sessions} sessions."
+            )
+        )
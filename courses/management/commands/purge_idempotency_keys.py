@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from courses.idempotency import IDEMPOTENCY_KEY_TTL
+from courses.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "Delete expired idempotency keys in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to give writers room.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pause = options["sleep"]
+        expired = IdempotencyKey.objects.filter(
+            created_at__lt=timezone.now() - IDEMPOTENCY_KEY_TTL
+        ).order_by("created_at")
+
+        total, batch_number = 0, 0
+        while True:
+            started = time.monotonic()
+            ids = list(expired.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+
+            deleted, _ = IdempotencyKey.objects.filter(id__in=ids).delete()
+            batch_number += 1
+            total += deleted
+            self.stdout.write(
+                f"Batch {batch_number}: {deleted} keys in {time.monotonic() - started:.3f}s"
+            )
+            if pause:
+                time.sleep(pause)
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {total} idempotency keys."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from courses.models import UserProgress
+from courses.progress import recompute_progress_for_course
+
+
+class Command(BaseCommand):
+    help = "Recompute stored section completion for every UserProgress row."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        course_ids = (
+            UserProgress.objects.order_by("course_id")
+            .values_list("course_id", flat=True)
+            .distinct()
+        )
+        count = 0
+        for course_id in course_ids:
+            count += recompute_progress_for_course(
+                course_id, batch_size=options["chunk_size"]
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Recomputed progress for {count} rows."))
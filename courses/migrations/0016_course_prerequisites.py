@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_challengeattempt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoursePrerequisite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_links', to='courses.course')),
+                ('prerequisite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='required_by_links', to='courses.course')),
+            ],
+            options={
+                'unique_together': {('course', 'prerequisite')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CoursePrerequisiteClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='courses.course')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prerequisite_closure', to='courses.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ancestor', 'course'], name='courses_cou_ancesto_ad3fbb_idx')],
+                'unique_together': {('course', 'ancestor')},
+            },
+        ),
+    ]
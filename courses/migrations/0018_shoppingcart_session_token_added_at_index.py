@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_courserecommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['session_token', 'added_at'], name='courses_sho_session_196610_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0024_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='completed_sections',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='completion_percentage',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0025_userprogress_completion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usercontentprogress',
+            index=models.Index(fields=['user', 'updated_at'], name='courses_use_user_id_f54b4e_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:17
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicate_user_cart_items(apps, schema_editor):
+    # قبل از ساخت قید، از هر (user, course) تکراری فقط قدیمی‌ترین ردیف می‌مونه
+    ShoppingCart = apps.get_model('courses', 'ShoppingCart')
+    keep_ids = (
+        ShoppingCart.objects.filter(user__isnull=False)
+        .values('user', 'course')
+        .annotate(keep_id=Min('id'))
+        .values('keep_id')
+    )
+    ShoppingCart.objects.filter(user__isnull=False).exclude(id__in=keep_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0026_usercontentprogress_user_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_user_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('user', 'course'), name='unique_user_cart_course'),
+        ),
+    ]
@@ -15,7 +15,46 @@ class Course(models.Model):
 
     def __str__(self):
         return self.title
-    
+
+
+class CoursePrerequisite(models.Model):
+    # یال‌های گراف پیش‌نیاز: course نیاز به prerequisite دارد
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='prerequisite_links')
+    prerequisite = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='required_by_links')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('course', 'prerequisite')
+
+    def __str__(self):
+        return f"{self.course.title} requires {self.prerequisite.title}"
+
+
+class CoursePrerequisiteClosure(models.Model):
+    # بستار تراگذری گراف پیش‌نیاز؛ فقط توسط prerequisites.py نگهداری می‌شه
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='prerequisite_closure')
+    ancestor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ('course', 'ancestor')
+        indexes = [models.Index(fields=['ancestor', 'course'])]
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.ancestor_id}"
+
+class CourseRecommendation(models.Model):
+    # «کسانی که این دوره رو خریدند این‌ها رو هم خریدند» — توسط build_course_recommendations ساخته می‌شه
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='recommendations')
+    recommended_course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.IntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('course', 'rank')
+
+    def __str__(self):
+        return f"{self.course_id} -> {self.recommended_course_id} ({self.score})"
+
 class ShoppingCart(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     session_token = models.CharField(max_length=100, null=True, blank=True)  # برای کاربران مهم نشده
@@ -24,6 +63,16 @@ class ShoppingCart(models.Model):
 
     class Meta:
         unique_together = ('user', 'course', 'session_token')  # فقط یکی از user یا session_token باید پر باشه
+        constraints = [
+            # unique_together بالا با session_token خالی (NULL) تکرار رو نمی‌گیره؛
+            # این قید درج هم‌زمان یک دوره در سبد کاربر رو با ignore_conflicts بی‌اثر می‌کنه
+            models.UniqueConstraint(
+                fields=['user', 'course'],
+                condition=models.Q(user__isnull=False),
+                name='unique_user_cart_course',
+            ),
+        ]
+        indexes = [models.Index(fields=['session_token', 'added_at'])]  # برای purge_anonymous_carts
 
     def __str__(self):
         return f"{self.user or self.session_token} - {self.course.title}"
@@ -34,6 +83,9 @@ class DiscountCode(models.Model):
     valid_from = models.DateTimeField()
     valid_to = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    max_redemptions = models.PositiveIntegerField(null=True, blank=True)  # خالی = نامحدود
+    per_user_limit = models.PositiveIntegerField(null=True, blank=True)  # خالی = نامحدود
+    times_used = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.code
@@ -53,6 +105,9 @@ class Order(models.Model):
         default='pending'
     )
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'status'])]
+
     def __str__(self):
         return f"Order {self.id} by {self.user.email}"
     
@@ -63,6 +118,109 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.course.title} in Order {self.order.id}"
 
+class DiscountRedemption(models.Model):
+    discount_code = models.ForeignKey(DiscountCode, on_delete=models.CASCADE, related_name='redemptions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='discount_redemptions')
+    redemption_number = models.PositiveIntegerField()  # 1, 2, ... برای هر کاربر
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # مثل ChallengeAttempt: رقابت دو درخواست هم‌زمان روی یک شماره با unique رد می‌شه
+        unique_together = ('discount_code', 'user', 'redemption_number')
+
+    def __str__(self):
+        return f"{self.discount_code.code} - {self.user_id} #{self.redemption_number}"
+
+class PaymentEvent(models.Model):
+    # صف callbackهای درگاه؛ endpoint فقط درج می‌کنه و process_payment_events پردازش می‌کنه
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processed', 'Processed'),
+        ('rejected', 'Rejected'),
+    ]
+
+    event_id = models.CharField(max_length=100, unique=True)
+    payload = models.JSONField()
+    signature = models.CharField(max_length=128, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.CharField(max_length=255, blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.status})"
+
+class OrderEvent(models.Model):
+    # outbox فقط‌افزودنی؛ در همون تراکنشی نوشته می‌شه که سفارش ساخته یا وضعیتش عوض می‌شه.
+    # id همون شماره‌ی ترتیب (sequence) برای cursor مصرف‌کننده‌هاست.
+    EVENT_TYPE_CHOICES = [
+        ('order.created', 'Order created'),
+        ('order.paid', 'Order paid'),
+        ('order.failed', 'Order failed'),
+    ]
+
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPE_CHOICES)
+    # بدون FK تا رویداد بعد از حذف سفارش هم باقی بمونه
+    order_id = models.BigIntegerField(db_index=True)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.event_type} (order {self.order_id})"
+
+class OrderEventConsumer(models.Model):
+    # آخرین sequence تأییدشده‌ی هر مصرف‌کننده؛ compaction تا کمترینشون رو پاک می‌کنه
+    name = models.CharField(max_length=100, unique=True)
+    last_sequence = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_sequence}"
+
+class DailySalesRollup(models.Model):
+    # جمع فروش هر روز (بر اساس تاریخ ثبت سفارش)؛ با paid شدن سفارش به‌روز و با backfill_sales_rollups بازسازی می‌شه
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discounted_orders = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date}: {self.orders} orders, {self.revenue}"
+
+class CourseSalesRollup(models.Model):
+    # فروش هر دوره در هر روز؛ مبلغ سفارش به نسبت قیمت دوره‌ها بین آیتم‌ها تقسیم می‌شه
+    date = models.DateField()
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    discounted_units = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'course')
+
+    def __str__(self):
+        return f"{self.date} - {self.course_id}: {self.units} units, {self.revenue}"
+
+class IdempotencyKey(models.Model):
+    # پاسخ ذخیره‌شده‌ی درخواست‌های checkout/payment برای جلوگیری از سفارش تکراری در retry
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    is_completed = models.BooleanField(default=False)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
 class Section(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='sections')
     section_name = models.CharField(max_length=100)
@@ -105,6 +263,9 @@ class UserProgress(models.Model):
     current_section = models.ForeignKey(Section, on_delete=models.SET_NULL, null=True, blank=True)
     last_visited_content = models.ForeignKey(Content, on_delete=models.SET_NULL, null=True, blank=True)
     completed = models.BooleanField(default=False)
+    # به‌صورت افزایشی با ثبت پیشرفت ویدیو و چالش به‌روز می‌شن (courses.progress.record_progress)
+    completed_sections = models.PositiveIntegerField(default=0)
+    completion_percentage = models.PositiveSmallIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -124,6 +285,8 @@ class UserContentProgress(models.Model):
 
     class Meta:
         unique_together = ('user', 'content')
+        # برای «ادامه‌ی یادگیری»: آخرین محتوای دیده‌شده‌ی کاربر
+        indexes = [models.Index(fields=['user', 'updated_at'])]
 
     def __str__(self):
         return f"{self.user.username} - {self.content.title}"
@@ -0,0 +1,90 @@
+from decimal import Decimal
+
+from django.db.models import Max, Min
+
+from .models import OrderEvent, OrderEventConsumer
+
+# حداکثر تعداد رویداد در هر صفحه‌ی API خواندن
+MAX_EVENTS_PER_PAGE = 1000
+
+
+class OrderEventSequenceError(Exception):
+    pass
+
+
+def order_event(event_type, order_id, user_id, total_amount, status, **extra):
+    """
+    یک OrderEvent ذخیره‌نشده می‌سازه تا همراه بقیه‌ی رویدادها با یک bulk_create درج بشه.
+    """
+    return OrderEvent(
+        event_type=event_type,
+        order_id=order_id,
+        payload={
+            "order_id": order_id,
+            "user_id": user_id,
+            # مثل ستون total_amount با دو رقم اعشار
+            "total_amount": str(Decimal(total_amount).quantize(Decimal("0.01"))),
+            "status": status,
+            **extra,
+        },
+    )
+
+
+def order_created_event(order, course_ids):
+    return order_event(
+        "order.created",
+        order.id,
+        order.user_id,
+        order.total_amount,
+        order.status,
+        discount_code=order.discount_code.code if order.discount_code_id else None,
+        course_ids=list(course_ids),
+    )
+
+
+def record_order_events(events):
+    """
+    رویدادها رو درج می‌کنه؛ باید داخل همون transaction.atomic تغییر سفارش صدا زده بشه
+    تا رویداد و تغییر یا با هم ثبت بشن یا هیچ‌کدوم.
+    """
+    OrderEvent.objects.bulk_create(events)
+
+
+def read_order_events(after=0, limit=MAX_EVENTS_PER_PAGE):
+    """
+    رویدادهای بعد از sequence داده‌شده به ترتیب. فقط از کلید اصلی می‌خونه
+    و هیچ اسکنی روی Order/OrderItem انجام نمی‌ده.
+    """
+    return list(
+        OrderEvent.objects.filter(id__gt=after)
+        .order_by("id")
+        .values("id", "event_type", "order_id", "payload", "created_at")[:limit]
+    )
+
+
+def acknowledge_order_events(consumer_name, sequence):
+    """
+    cursor مصرف‌کننده رو جلو می‌بره (هیچ‌وقت عقب نمی‌ره) و مقدار جدیدش رو برمی‌گردونه.
+    sequence بیشتر از آخرین رویداد موجود رد می‌شه؛ وگرنه رویدادهای آینده بی‌صدا رد می‌شدن
+    و compact_order_events بعداً پاکشون می‌کرد.
+    """
+    latest = OrderEvent.objects.aggregate(latest=Max("id"))["latest"] or 0
+    if sequence > latest:
+        raise OrderEventSequenceError(
+            f"Sequence {sequence} is beyond the latest event ({latest})."
+        )
+
+    consumer, _ = OrderEventConsumer.objects.get_or_create(name=consumer_name)
+    if sequence > consumer.last_sequence:
+        OrderEventConsumer.objects.filter(
+            pk=consumer.pk, last_sequence__lt=sequence
+        ).update(last_sequence=sequence)
+        consumer.refresh_from_db(fields=["last_sequence"])
+    return consumer.last_sequence
+
+
+def delivered_sequence():
+    """
+    بزرگ‌ترین sequence که همه‌ی مصرف‌کننده‌ها تأییدش کردن؛ بدون مصرف‌کننده 0.
+    """
+    return OrderEventConsumer.objects.aggregate(low=Min("last_sequence"))["low"] or 0
@@ -0,0 +1,140 @@
+from django.db.models import Count, Prefetch, Q
+
+from .models import ChallengeAttempt, Content, Section, UserContentProgress, UserProgress
+
+MAX_CHALLENGE_ATTEMPTS = 3
+
+
+class PlayerState:
+    """
+    گراف دوره (سرفصل‌ها و محتواها) و پیشرفت کاربر، یک بار لود می‌شه و همه‌ی بخش‌های
+    پاسخ player (فهرست، قفل سرفصل‌ها، محتوای فعلی، خلاصه‌ی تلاش‌های چالش) از همین داده ساخته می‌شن.
+    """
+
+    def __init__(self, user, course):
+        self.course = course
+        self.sections = list(
+            Section.objects.filter(course=course)
+            .order_by("order_number")
+            .prefetch_related(
+                Prefetch("contents", queryset=Content.objects.order_by("id"))
+            )
+        )
+        self.completed_video_ids = set(
+            UserContentProgress.objects.filter(
+                user=user, content__section__course=course, is_completed=True
+            ).values_list("content_id", flat=True)
+        )
+        self.attempts = {
+            row["content_id"]: row
+            for row in ChallengeAttempt.objects.filter(
+                user=user, content__section__course=course
+            )
+            .values("content_id")
+            .annotate(
+                attempt_count=Count("id"),
+                successful_count=Count("id", filter=Q(is_successful=True)),
+            )
+        }
+        self.progress = UserProgress.objects.filter(user=user, course=course).first()
+        self._unlocked = self._compute_unlocked()
+
+    def contents_of(self, section, content_type):
+        return [c for c in section.contents.all() if c.content_type == content_type]
+
+    def challenge_summary(self, challenge):
+        row = self.attempts.get(challenge.id)
+        return {
+            "attempt_count": row["attempt_count"] if row else 0,
+            "max_attempts": MAX_CHALLENGE_ATTEMPTS,
+            "is_successful": bool(row and row["successful_count"]),
+        }
+
+    def _compute_unlocked(self):
+        # همون قواعد CourseSectionStatusSerializer.get_is_unlocked، بدون کوئری برای هر سرفصل
+        unlocked = set()
+        for index, section in enumerate(self.sections):
+            if section.order_number == 1:
+                unlocked.add(section.id)
+
+            # ویدیوی ۸۰٪ دیده‌شده دو سرفصل بعدی رو باز می‌کنه
+            videos = self.contents_of(section, "video")
+            if videos and videos[0].id in self.completed_video_ids:
+                unlocked.update(s.id for s in self.sections[index + 1 : index + 3])
+
+            # سرفصل کارت راهنما تا وقتی چالش قابل حل باشه بازه (can_access_challenge)
+            guides = self.contents_of(section, "guide_card")
+            if guides:
+                summary = self.challenge_summary(guides[0])
+                if summary["is_successful"] or summary["attempt_count"] < MAX_CHALLENGE_ATTEMPTS:
+                    unlocked.add(section.id)
+
+            # حل شدن چالش سرفصل قبلی
+            previous = self.section_by_order(section.order_number - 1)
+            if previous is not None:
+                challenges = self.contents_of(previous, "challenge")
+                if challenges and self.challenge_summary(challenges[0])["is_successful"]:
+                    unlocked.add(section.id)
+        return unlocked
+
+    def is_unlocked(self, section):
+        return section.id in self._unlocked
+
+    def section_by_order(self, order_number):
+        return next(
+            (s for s in self.sections if s.order_number == order_number), None
+        )
+
+    def current_section(self):
+        """
+        سرفصلی که کاربر آخرین بار درش بوده؛ در غیر این صورت اولین سرفصل.
+        """
+        if self.progress and self.progress.current_section_id:
+            for section in self.sections:
+                if section.id == self.progress.current_section_id:
+                    return section
+        return self.sections[0] if self.sections else None
+
+
+
+def first_content_id(section, content_type):
+    return next(
+        (c.id for c in section.contents.all() if c.content_type == content_type), None
+    )
+
+
+def is_prefetched_section_unlocked(user, section, sections, completed_video_ids=()):
+    """
+    قواعد قفل PlayerState برای یک سرفصل، از روی سرفصل‌هایی که همراه محتواهاشون قبلاً لود شدن
+    (sections: {order_number: section}، شامل دو سرفصل قبل از section).
+    سرفصل اول و سرفصل کارت راهنما بدون کوئری بازن؛ در غیر این صورت حداکثر یک کوئری برای
+    ویدیوی تکمیل‌شده‌ی دو سرفصل قبل یا چالش حل‌شده‌ی سرفصل قبل.
+    completed_video_ids ویدیوهایی هستن که caller از قبل می‌دونه تکمیل شدن.
+    """
+    if section.order_number == 1 or first_content_id(section, "guide_card"):
+        return True
+
+    previous = sections.get(section.order_number - 1)
+    before_previous = sections.get(section.order_number - 2)
+    video_ids = {
+        first_content_id(s, "video") for s in (previous, before_previous) if s is not None
+    } - {None}
+    if video_ids & set(completed_video_ids):
+        return True
+
+    challenge_id = first_content_id(previous, "challenge") if previous else None
+    if not video_ids and challenge_id is None:
+        return False
+
+    return Content.objects.filter(
+        Q(
+            id__in=video_ids,
+            usercontentprogress__user=user,
+            usercontentprogress__is_completed=True,
+        )
+        | Q(
+            id=challenge_id,
+            challengeattempt__user=user,
+            challengeattempt__is_successful=True,
+        )
+    ).exists()
@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Course, CoursePrerequisite, CoursePrerequisiteClosure, UserProgress
+
+
+class PrerequisiteCycleError(Exception):
+    pass
+
+
+def _descendant_ids(course_id):
+    # خود دوره + همه‌ی دوره‌هایی که (مستقیم یا غیرمستقیم) به آن نیاز دارند
+    return [course_id] + list(
+        CoursePrerequisiteClosure.objects.filter(ancestor_id=course_id).values_list(
+            "course_id", flat=True
+        )
+    )
+
+
+def _ancestor_ids(course_id):
+    return [course_id] + list(
+        CoursePrerequisiteClosure.objects.filter(course_id=course_id).values_list(
+            "ancestor_id", flat=True
+        )
+    )
+
+
+def add_prerequisite(course, prerequisite):
+    """
+    یال course -> prerequisite رو اضافه می‌کنه و بستار رو به‌صورت افزایشی به‌روز می‌کنه.
+    اگر یال باعث دور بشه PrerequisiteCycleError می‌ده.
+    """
+    if course.id == prerequisite.id:
+        raise PrerequisiteCycleError("A course cannot be its own prerequisite.")
+
+    with transaction.atomic():
+        # اگر prerequisite خودش (مستقیم یا غیرمستقیم) به course نیاز داشته باشه، دور داریم
+        if CoursePrerequisiteClosure.objects.filter(
+            course=prerequisite, ancestor=course
+        ).exists():
+            raise PrerequisiteCycleError("This prerequisite would create a cycle.")
+
+        link, created = CoursePrerequisite.objects.get_or_create(
+            course=course, prerequisite=prerequisite
+        )
+        if created:
+            descendants = _descendant_ids(course.id)
+            ancestors = _ancestor_ids(prerequisite.id)
+            CoursePrerequisiteClosure.objects.bulk_create(
+                [
+                    CoursePrerequisiteClosure(course_id=d, ancestor_id=a)
+                    for d in descendants
+                    for a in ancestors
+                ],
+                ignore_conflicts=True,
+            )
+
+    return link, created
+
+
+def remove_prerequisite(course, prerequisite):
+    """
+    یال رو حذف می‌کنه و بستار رو فقط برای course و دوره‌های وابسته به آن از نو می‌سازه.
+    """
+    with transaction.atomic():
+        deleted, _ = CoursePrerequisite.objects.filter(
+            course=course, prerequisite=prerequisite
+        ).delete()
+        if deleted:
+            _rebuild_closure_for(_descendant_ids(course.id))
+    return bool(deleted)
+
+
+def _rebuild_closure_for(course_ids):
+    edges = defaultdict(list)
+    for course_id, prerequisite_id in CoursePrerequisite.objects.values_list(
+        "course_id", "prerequisite_id"
+    ):
+        edges[course_id].append(prerequisite_id)
+
+    rows = []
+    for course_id in course_ids:
+        seen = set()
+        stack = list(edges[course_id])
+        while stack:
+            ancestor_id = stack.pop()
+            if ancestor_id in seen:
+                continue
+            seen.add(ancestor_id)
+            stack.extend(edges[ancestor_id])
+        rows.extend(
+            CoursePrerequisiteClosure(course_id=course_id, ancestor_id=ancestor_id)
+            for ancestor_id in seen
+        )
+
+    CoursePrerequisiteClosure.objects.filter(course_id__in=course_ids).delete()
+    CoursePrerequisiteClosure.objects.bulk_create(rows)
+
+
+def eligible_courses_for(user):
+    """
+    دوره‌هایی که کاربر هنوز نخریده و همه‌ی پیش‌نیازهای (تراگذری) آن‌ها رو تموم کرده.
+    کل محاسبه در یک کوئری انجام می‌شه.
+    """
+    completed_courses = UserProgress.objects.filter(user=user, completed=True).values(
+        "course_id"
+    )
+    blocked_courses = CoursePrerequisiteClosure.objects.exclude(
+        ancestor_id__in=completed_courses
+    ).values("course_id")
+    owned_courses = UserProgress.objects.filter(user=user).values("course_id")
+
+    return (
+        Course.objects.exclude(id__in=blocked_courses)
+        .exclude(id__in=owned_courses)
+        .order_by("id")
+    )
+
+
+def missing_prerequisites_for(user, course):
+    """
+    همه‌ی پیش‌نیازهای (تراگذری) یک دوره به همراه وضعیت تکمیل آن‌ها برای کاربر.
+    """
+    ancestors = Course.objects.filter(
+        id__in=CoursePrerequisiteClosure.objects.filter(course=course).values(
+            "ancestor_id"
+        )
+    ).order_by("id")
+    completed_ids = set(
+        UserProgress.objects.filter(
+            user=user, completed=True, course__in=ancestors
+        ).values_list("course_id", flat=True)
+    )
+    return [(ancestor, ancestor.id in completed_ids) for ancestor in ancestors]
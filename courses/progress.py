@@ -0,0 +1,220 @@
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    F,
+    FilteredRelation,
+    OuterRef,
+    Q,
+    Window,
+    When,
+)
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import ChallengeAttempt, Content, Section, UserContentProgress, UserProgress
+
+# محتواهایی که تکمیلشون قابل اندازه‌گیریه: ویدیو (۸۰٪ دیده شده) و چالش (حداقل یک تلاش موفق).
+# سرفصلی تکمیل‌شده حساب می‌شه که همه‌ی محتواهای قابل پیگیریش تکمیل شده باشن.
+TRACKED_CONTENT_TYPES = ("video", "challenge")
+
+
+def section_completion(user, section_ids):
+    """
+    {section_id: تکمیل شده یا نه} برای سرفصل‌های داده‌شده، با یک کوئری.
+    سرفصل بدون محتوای قابل پیگیری (مثلاً فقط کارت راهنما) تکمیل‌شده حساب نمی‌شه.
+    """
+    state = {section_id: False for section_id in section_ids}
+    contents = (
+        Content.objects.filter(
+            section_id__in=section_ids, content_type__in=TRACKED_CONTENT_TYPES
+        )
+        .annotate(
+            done=Case(
+                When(
+                    content_type="video",
+                    then=Exists(
+                        UserContentProgress.objects.filter(
+                            user=user, content=OuterRef("pk"), is_completed=True
+                        )
+                    ),
+                ),
+                default=Exists(
+                    ChallengeAttempt.objects.filter(
+                        user=user, content=OuterRef("pk"), is_successful=True
+                    )
+                ),
+                output_field=BooleanField(),
+            )
+        )
+        .values_list("section_id", "done")
+    )
+
+    pending = set()
+    for section_id, done in contents:
+        state[section_id] = True
+        if not done:
+            pending.add(section_id)
+    for section_id in pending:
+        state[section_id] = False
+    return state
+
+
+def trackable_sections(course_id):
+    return Section.objects.filter(course_id=course_id).filter(
+        Exists(
+            Content.objects.filter(
+                section=OuterRef("pk"), content_type__in=TRACKED_CONTENT_TYPES
+            )
+        )
+    )
+
+
+def progress_percentage(completed, total):
+    if not total:
+        return 0
+    return round(min(completed, total) * 100 / total)
+
+
+@contextmanager
+def record_progress(user, content, section_ids=None):
+    """
+    آخرین محتوای دیده‌شده و سرفصل فعلی رو روی UserProgress ثبت می‌کنه؛ تغییر پیشرفت
+    (ذخیره‌ی UserContentProgress یا ChallengeAttempt) باید داخل بلوک with انجام بشه.
+    اگر section_ids داده بشه، ردیف UserProgress قفل می‌شه و وضعیت تکمیل همین سرفصل‌ها
+    قبل و بعد از بلوک زیر همون قفل گرفته می‌شه؛ فقط تفاوتشون به completed_sections
+    اضافه/کم می‌شه و دو درخواست هم‌زمان یک تغییر رو دو بار حساب نمی‌کنن.
+    """
+    section = content.section
+    progress_rows = UserProgress.objects.filter(user=user, course_id=section.course_id)
+
+    if not section_ids:
+        yield
+        progress_rows.update(
+            last_visited_content=content, current_section=section, updated_at=timezone.now()
+        )
+        return
+
+    with transaction.atomic():
+        progress = progress_rows.select_for_update().first()
+        sections_before = section_completion(user, section_ids) if progress else None
+        yield
+        if progress is None:
+            return
+
+        sections_after = section_completion(user, section_ids)
+        delta = sum(
+            int(sections_after[section_id]) - int(done)
+            for section_id, done in sections_before.items()
+        )
+        update_fields = ["last_visited_content", "current_section", "updated_at"]
+        if delta:
+            total = trackable_sections(section.course_id).count()
+            progress.completed_sections = max(
+                0, min(progress.completed_sections + delta, total)
+            )
+            progress.completion_percentage = progress_percentage(
+                progress.completed_sections, total
+            )
+            progress.completed = bool(total) and progress.completed_sections >= total
+            update_fields += ["completed_sections", "completion_percentage", "completed"]
+        progress.last_visited_content = content
+        progress.current_section = section
+        progress.save(update_fields=update_fields)
+
+
+def recompute_progress_for_course(course_id, batch_size=500):
+    """
+    completed_sections همه‌ی ردیف‌های UserProgress یک دوره رو از صفر حساب می‌کنه؛ بعد از
+    اضافه یا حذف محتوا/سرفصل (که تعداد سرفصل‌های قابل پیگیری رو عوض می‌کنه) و برای
+    مقداردهی اولیه. تعداد کوئری به تعداد کاربرها بستگی نداره: محتواها، ویدیوهای تکمیل‌شده،
+    چالش‌های موفق و ردیف‌های پیشرفت هر کدوم یک کوئری و ذخیره با bulk_update.
+    تعداد ردیف‌های به‌روز شده رو برمی‌گردونه.
+    """
+    section_contents = defaultdict(set)
+    content_types = {}
+    for content_id, section_id, content_type in Content.objects.filter(
+        section__course_id=course_id, content_type__in=TRACKED_CONTENT_TYPES
+    ).values_list("id", "section_id", "content_type"):
+        section_contents[section_id].add(content_id)
+        content_types[content_id] = content_type
+    total = len(section_contents)
+
+    done = defaultdict(set)
+    completed_videos = UserContentProgress.objects.filter(
+        content_id__in=[c for c, t in content_types.items() if t == "video"],
+        is_completed=True,
+    ).values_list("user_id", "content_id")
+    solved_challenges = (
+        ChallengeAttempt.objects.filter(
+            content_id__in=[c for c, t in content_types.items() if t == "challenge"],
+            is_successful=True,
+        )
+        .values_list("user_id", "content_id")
+        .distinct()
+    )
+    for rows in (completed_videos, solved_challenges):
+        for user_id, content_id in rows:
+            done[user_id].add(content_id)
+
+    progress_rows = list(
+        UserProgress.objects.filter(course_id=course_id).only("id", "user_id", "course_id")
+    )
+    for progress in progress_rows:
+        user_done = done.get(progress.user_id, set())
+        completed = sum(1 for ids in section_contents.values() if ids <= user_done)
+        progress.completed_sections = completed
+        progress.completion_percentage = progress_percentage(completed, total)
+        progress.completed = bool(total) and completed >= total
+    UserProgress.objects.bulk_update(
+        progress_rows,
+        ["completed_sections", "completion_percentage", "completed"],
+        batch_size=batch_size,
+    )
+    return len(progress_rows)
+
+
+def annotate_course_progress(courses, user):
+    """
+    ستون‌های پیشرفت ذخیره‌شده‌ی UserProgress کاربر رو به کوئری دوره‌ها اضافه می‌کنه و فقط
+    دوره‌هایی که کاربر ردیف UserProgress داره (دسترسی داره) رو نگه می‌داره.
+    join با FilteredRelation به ردیف همین کاربر محدود می‌شه و مستقیم از دیتابیس خونده می‌شه،
+    نه از کش دسترسی‌ها که ممکنه در این پروسه کهنه باشه.
+    """
+    return courses.annotate(
+        user_progress=FilteredRelation("userprogress", condition=Q(userprogress__user=user)),
+        progress_completed=F("user_progress__completed"),
+        completed_sections=F("user_progress__completed_sections"),
+        completion_percentage=F("user_progress__completion_percentage"),
+        last_content_id=F("user_progress__last_visited_content_id"),
+        last_content_title=F("user_progress__last_visited_content__title"),
+        current_section_id=F("user_progress__current_section_id"),
+        progress_updated_at=F("user_progress__updated_at"),
+    ).filter(user_progress__isnull=False)
+
+
+def latest_content_progress(user, course_ids):
+    """
+    برای هر دوره آخرین UserContentProgress کاربر (بر اساس updated_at) با یک کوئری:
+    ROW_NUMBER() روی هر دوره و فقط ردیف اول. خروجی dict از course_id به ردیف.
+    """
+    rows = (
+        UserContentProgress.objects.filter(
+            user=user, content__section__course_id__in=course_ids
+        )
+        .select_related("content__section")
+        .annotate(
+            course_id=F("content__section__course_id"),
+            recency=Window(
+                RowNumber(),
+                partition_by=F("content__section__course_id"),
+                order_by=[F("updated_at").desc(), F("id").desc()],
+            ),
+        )
+        .filter(recency=1)
+    )
+    return {row.course_id: row for row in rows}
@@ -0,0 +1,49 @@
+import hashlib
+from decimal import Decimal
+
+from django.core import signing
+
+# پیش‌فاکتور امضاشده (HMAC) که apply-discount صادر می‌کنه و checkout دوباره استفاده می‌کنه
+QUOTE_SALT = "courses.quote"
+QUOTE_MAX_AGE = 60 * 10
+
+
+def cart_fingerprint(rows):
+    """
+    اثر انگشت ارزان سبد: هش (course_id, price)های مرتب‌شده.
+    با تغییر محتوا یا قیمت هر دوره‌ی سبد عوض می‌شه.
+    """
+    payload = ";".join(f"{course_id}:{price}" for course_id, price in sorted(rows))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def make_quote(user, cart_items, discount, total_price):
+    fingerprint = cart_fingerprint(
+        (item.course_id, item.course.price) for item in cart_items
+    )
+    return signing.dumps(
+        {
+            "u": user.id if user.is_authenticated else None,
+            "f": fingerprint,
+            "d": discount.code if discount else None,
+            "t": str(total_price),
+        },
+        salt=QUOTE_SALT,
+        compress=True,
+    )
+
+
+def load_quote(token, user, cart_rows):
+    """
+    اگر امضا و زمان پیش‌فاکتور معتبر باشه و سبد فعلی کاربر تغییر نکرده باشه
+    dict پیش‌فاکتور رو برمی‌گردونه (کد تخفیف و قیمت قبل از تخفیف)، وگرنه None.
+    """
+    try:
+        quote = signing.loads(token, salt=QUOTE_SALT, max_age=QUOTE_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+    if quote.get("u") != user.id or quote.get("f") != cart_fingerprint(cart_rows):
+        return None
+
+    return {"discount_code": quote.get("d"), "total_price": Decimal(quote["t"])}
@@ -6,14 +6,15 @@ from .models import (
     Order,
     Section,
     Content,
-    UserProgress,
     OrderItem,
     UserContentProgress,
     ChallengeAttempt,
 )
 from accounts.models import User
-from django.utils import timezone
 from .utils import unlock_next_sections,can_access_challenge
+from .cart import get_cart, cart_queryset, ANONYMOUS_CART_MAX_ITEMS
+from .quotes import load_quote
+from .discounts import resolve_discount_code, DiscountCodeError
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -51,9 +52,21 @@ class AddToCartSerializer(serializers.Serializer):
     course_id = serializers.IntegerField()
 
     def validate_course_id(self, value):
-        if not Course.objects.filter(id=value).exists():
+        # خود دوره برگردونده می‌شه تا View دوباره کوئری نزنه
+        try:
+            return Course.objects.get(id=value)
+        except Course.DoesNotExist:
             raise serializers.ValidationError("Course does not exist.")
-        return value
+
+
+class BulkCartSerializer(serializers.Serializer):
+    course_ids = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=ANONYMOUS_CART_MAX_ITEMS
+    )
+
+    def validate_course_ids(self, value):
+        # حذف تکراری‌ها با حفظ ترتیب
+        return list(dict.fromkeys(value))
 
 
 # برای خروجی
@@ -73,53 +86,77 @@ class DiscountCodeSerializer(serializers.Serializer):
 
     def validate_code(self, value):
         try:
-            discount = DiscountCode.objects.get(code=value)
-        except DiscountCode.DoesNotExist:
-            raise serializers.ValidationError("Invalid or expired discount code.")
+            return resolve_discount_code(value)
+        except DiscountCodeError as e:
+            raise serializers.ValidationError(str(e))
 
-        if not discount.is_active:
-            raise serializers.ValidationError("This discount code is not active.")
 
-        if discount.valid_to < timezone.now():
-            raise serializers.ValidationError("This discount code has expired.")
+class BulkDiscountCodeSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=500000)
+    discount_percent = serializers.DecimalField(max_digits=5, decimal_places=2)
+    valid_from = serializers.DateTimeField()
+    valid_to = serializers.DateTimeField()
+    prefix = serializers.CharField(required=False, allow_blank=True, default="", max_length=20)
+    length = serializers.IntegerField(required=False, default=10, min_value=6, max_value=20)
+    max_redemptions = serializers.IntegerField(required=False, default=1, min_value=1, allow_null=True)
+    per_user_limit = serializers.IntegerField(required=False, default=1, min_value=1, allow_null=True)
 
-        return discount
+    def validate(self, data):
+        if data["valid_to"] <= data["valid_from"]:
+            raise serializers.ValidationError("valid_to must be after valid_from.")
+        if not 0 < data["discount_percent"] <= 100:
+            raise serializers.ValidationError(
+                {"discount_percent": "Must be between 0 and 100."}
+            )
+        max_code_length = DiscountCode._meta.get_field("code").max_length
+        if len(data["prefix"]) + data["length"] > max_code_length:
+            raise serializers.ValidationError(
+                f"prefix and length together must not exceed {max_code_length} characters."
+            )
+        return data
 
 
 class CheckoutSerializer(serializers.Serializer):
     discount_code = serializers.CharField(required=False, allow_blank=True)
+    quote = serializers.CharField(required=False, allow_blank=True)
 
     def validate(self, data):
         request = self.context.get("request")
-        cart_items = []
 
-        if request.user.is_authenticated:
-            cart_items = ShoppingCart.objects.filter(user=request.user)
-        else:
-            session_token = request.session.session_key
-            if not session_token:
-                raise serializers.ValidationError("No active cart found.")
-            cart_items = ShoppingCart.objects.filter(session_token=session_token)
+        # اگر پیش‌فاکتور apply-discount هنوز با سبد فعلی می‌خونه، محاسبه تکرار نمی‌شه
+        if data.get("quote"):
+            cart_rows = list(
+                cart_queryset(request).values_list("course_id", "course__price")
+            )
+            quote = load_quote(data["quote"], request.user, cart_rows) if cart_rows else None
+            requested_code = data.get("discount_code") or None
+            if quote and requested_code in (None, quote["discount_code"]):
+                discount = None
+                if quote["discount_code"]:
+                    try:
+                        discount = resolve_discount_code(quote["discount_code"])
+                    except DiscountCodeError as e:
+                        raise serializers.ValidationError(str(e))
+                data["discount_code"] = discount
+                data["total_price"] = quote["total_price"]
+                data["course_ids"] = [course_id for course_id, _ in cart_rows]
+                return data
 
-        if not cart_items.exists():
+        cart_items, total_price = get_cart(request)
+        if not cart_items:
             raise serializers.ValidationError("Your cart is empty.")
 
         # چک کردن کد تخفیف
         discount_code = data.get("discount_code")
         if discount_code:
             try:
-                discount = DiscountCode.objects.get(code=discount_code)
-                if not discount.is_active:
-                    raise serializers.ValidationError(
-                        "This discount code is not active."
-                    )
-                if discount.valid_to < timezone.now():
-                    raise serializers.ValidationError("This discount code has expired.")
-                data["discount_code"] = discount
-            except DiscountCode.DoesNotExist:
-                raise serializers.ValidationError("Invalid or expired discount code.")
+                data["discount_code"] = resolve_discount_code(discount_code)
+            except DiscountCodeError as e:
+                raise serializers.ValidationError(str(e))
 
         data["cart_items"] = cart_items
+        data["course_ids"] = [item.course_id for item in cart_items]
+        data["total_price"] = total_price
         return data
 
 
@@ -130,6 +167,16 @@ class PurchasedCourseSerializer(serializers.Serializer):
     purchased_at = serializers.DateTimeField()
 
 
+class RecommendedCourseSerializer(serializers.Serializer):
+    # ردیف‌های values() از CourseRecommendation؛ قیمت مثل CourseSerializer رشته‌ی "11.00" می‌شه
+    id = serializers.IntegerField(source="recommended_course_id")
+    title = serializers.CharField(source="recommended_course__title")
+    price = serializers.DecimalField(
+        source="recommended_course__price", max_digits=6, decimal_places=2
+    )
+    course_image = serializers.URLField(source="recommended_course__course_image")
+
+
 class SectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Section
@@ -249,31 +296,19 @@ class MyCourseSerializer(serializers.ModelSerializer):
         ]
 
     def get_progress(self, obj):
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
-            return None
-
-        try:
-            progress = UserProgress.objects.get(user=request.user, course=obj)
-            return {
-                "completed": progress.completed,
-                # "last_section": (
-                #     progress.last_section.section_name
-                #     if progress.last_section
-                #     else None
-                # ),
-                # "last_content": (
-                #     progress.last_content.title if progress.last_content else None
-                # ),
-                "updated_at": progress.updated_at,
-            }
-        except UserProgress.DoesNotExist:
-            return {
-                "completed": False,
-                "last_section": None,
-                "last_content": None,
-                "updated_at": None,
-            }
+        # مقادیر ذخیره‌شده‌ی UserProgress که annotate_course_progress به کوئری اضافه کرده
+        return {
+            "completed": obj.progress_completed,
+            "percentage": obj.completion_percentage,
+            "completed_sections": obj.completed_sections,
+            "current_section_id": obj.current_section_id,
+            "last_content": (
+                {"id": obj.last_content_id, "title": obj.last_content_title}
+                if obj.last_content_id
+                else None
+            ),
+            "updated_at": obj.progress_updated_at,
+        }
 
 
 class PurchaseHistorySerializer(serializers.ModelSerializer):
@@ -284,7 +319,25 @@ class PurchaseHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = OrderItem
-        fields = ["course_title", "course_price"]
+        fields = ["course_id", "course_title", "course_price"]
+
+
+class PurchaseHistoryOrderSerializer(serializers.ModelSerializer):
+    order_id = serializers.IntegerField(source="id")
+    discount_code = serializers.CharField(
+        source="discount_code.code", default=None, read_only=True
+    )
+    items = PurchaseHistorySerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ["order_id", "created_at", "total_amount", "discount_code", "items"]
+
+
+class PurchaseHistoryQuerySerializer(serializers.Serializer):
+    # cursor: id آخرین ردیف صفحه‌ی قبل
+    before = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
 
 class HomePageCourseSerializer(serializers.ModelSerializer):
     buyer_count = serializers.IntegerField(read_only=True)
@@ -395,6 +448,20 @@ class ContentSerializer(serializers.ModelSerializer):
         ]
 
 
+class PrefetchedSectionSerializer(serializers.ModelSerializer):
+    # سرفصل بعدی که همراه پاسخ سرفصل فعلی فرستاده می‌شه؛ contents باید prefetch شده باشه
+    section_order = serializers.IntegerField(source="order_number")
+    content_count = serializers.SerializerMethodField()
+    content = ContentSerializer(source="contents", many=True, read_only=True)
+
+    class Meta:
+        model = Section
+        fields = ["id", "section_order", "section_name", "content_count", "content"]
+
+    def get_content_count(self, obj):
+        return len(obj.contents.all())
+
+
 class ChallengeAttemptSummarySerializer(serializers.Serializer):
     attempt_count = serializers.IntegerField()
     max_attempts = serializers.IntegerField(default=3)
@@ -470,4 +537,29 @@ class SubmitChallengeSerializer(serializers.Serializer):
 class ChallengeAttemptSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChallengeAttempt
-        fields = ['attempt_number', 'is_successful', 'submitted_at']
\ No newline at end of file
+        fields = ['attempt_number', 'is_successful', 'submitted_at']
+
+class AddPrerequisiteSerializer(serializers.Serializer):
+    prerequisite_id = serializers.IntegerField()
+
+    def validate_prerequisite_id(self, value):
+        try:
+            return Course.objects.get(id=value)
+        except Course.DoesNotExist:
+            raise serializers.ValidationError("Course does not exist.")
+
+
+class OrderEventsQuerySerializer(serializers.Serializer):
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, default=100, min_value=1, max_value=1000)
+    consumer = serializers.CharField(required=False, max_length=100)
+
+
+class OrderEventAckSerializer(serializers.Serializer):
+    consumer = serializers.CharField(max_length=100)
+    sequence = serializers.IntegerField(min_value=0)
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
@@ -1,3 +1,785 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+
+from accounts.models import User
+
+from . import discounts
+from .analytics import _allocate, accumulate_rollups
+from .idempotency import IDEMPOTENCY_LEASE, idempotent
+from .models import (
+    Content,
+    Course,
+    CoursePrerequisiteClosure,
+    DiscountCode,
+    DiscountRedemption,
+    IdempotencyKey,
+    Order,
+    OrderEventConsumer,
+    OrderItem,
+    PaymentEvent,
+    Section,
+    ShoppingCart,
+    UserContentProgress,
+    UserProgress,
+)
+from .payment_gateway import MAX_CALLBACK_BODY_BYTES, LocalGatewayStub
+from .prerequisites import (
+    PrerequisiteCycleError,
+    add_prerequisite,
+    eligible_courses_for,
+    missing_prerequisites_for,
+    remove_prerequisite,
+)
+from .progress import recompute_progress_for_course
+
+
+class ConcurrentCheckoutDiscountTests(TransactionTestCase):
+    # سقف max_redemptions باید زیر checkoutهای هم‌زمان هم دقیقاً رعایت بشه
+    # SQLite فقط یک نویسنده در هر لحظه داره، پس checkoutها پشت قفل فایل سری می‌شن؛
+    # سقف زمان کل نشون می‌ده که درخواست‌ها با هم منتظر می‌مونن و جلوی هم رو نمی‌گیرن
+    MAX_REDEMPTIONS = 20
+    BUYERS = 200
+    MAX_ELAPSED_SECONDS = 30
+
+    def setUp(self):
+        now = timezone.now()
+        self.discount = DiscountCode.objects.create(
+            code="LIMITED",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            max_redemptions=self.MAX_REDEMPTIONS,
+        )
+        course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=100
+        )
+        User.objects.bulk_create(
+            [User(username=f"buyer{i}", email=f"buyer{i}@example.com") for i in range(self.BUYERS)]
+        )
+        self.users = list(User.objects.filter(username__startswith="buyer"))
+        ShoppingCart.objects.bulk_create(
+            [ShoppingCart(user=user, course=course) for user in self.users]
+        )
+
+    def _checkout(self, user, barrier, statuses):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            response = client.post("/api/checkout", {"discount_code": "LIMITED"})
+            statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_parallel_checkouts_respect_max_redemptions(self):
+        barrier = threading.Barrier(self.BUYERS)
+        statuses = []
+        threads = [
+            threading.Thread(target=self._checkout, args=(user, barrier, statuses))
+            for user in self.users
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        self.discount.refresh_from_db()
+        self.assertEqual(self.discount.times_used, self.MAX_REDEMPTIONS)
+        self.assertEqual(
+            Order.objects.filter(discount_code=self.discount).count(), self.MAX_REDEMPTIONS
+        )
+        self.assertEqual(statuses.count(200), self.MAX_REDEMPTIONS)
+        self.assertEqual(statuses.count(400), self.BUYERS - self.MAX_REDEMPTIONS)
+        self.assertLess(elapsed, self.MAX_ELAPSED_SECONDS)
+
+
+class ViewCartQueryTests(TestCase):
+    def test_view_cart_uses_two_queries(self):
+        user = User.objects.create_user(
+            username="shopper", email="shopper@example.com", password="pass"
+        )
+        for i in range(5):
+            course = Course.objects.create(
+                title=f"Course {i}", description="-", instructor="-", duration_minutes=10, price=10 + i
+            )
+            ShoppingCart.objects.create(user=user, course=course)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        # یک کوئری برای آیتم‌ها همراه با دوره و یک Sum، مستقل از تعداد آیتم‌ها
+        with self.assertNumQueries(2):
+            response = client.get("/api/view-cart")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["cart_items"]), 5)
+        self.assertEqual(response.data["total_price"], 60)
+
+
+
+class SimulatePaymentQueryTests(TestCase):
+    # تعداد کوئری پرداخت به تعداد دوره‌های سبد بستگی نداره (rollupها یک UPDATE برای هر روز)
+    QUERIES = 14
+
+    def _client_with_cart(self, course_count):
+        user = User.objects.create_user(
+            username=f"payer{course_count}", email=f"payer{course_count}@example.com", password="pass"
+        )
+        for i in range(course_count):
+            course = Course.objects.create(
+                title=f"Course {i}", description="-", instructor="-", duration_minutes=10, price=10
+            )
+            ShoppingCart.objects.create(user=user, course=course)
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        for course_count in (2, 20):
+            client = self._client_with_cart(course_count)
+            with self.assertNumQueries(self.QUERIES):
+                response = client.post("/api/simulate-payment")
+            self.assertEqual(response.status_code, 200)
+
+
+class MyCoursesListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="learner", email="learner@example.com", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_access_granted_by_another_process_is_listed(self):
+        first, second = [
+            Course.objects.create(
+                title=f"Course {i}", description="-", instructor="-", duration_minutes=10, price=10
+            )
+            for i in range(2)
+        ]
+        UserProgress.objects.create(user=self.user, course=first)
+        self.client.get("/api/my-courses")
+
+        # مثل process_payment_events در پروسه‌ی دیگه: بدون سیگنال و بدون پاک شدن کش این پروسه
+        UserProgress.objects.bulk_create([UserProgress(user=self.user, course=second)])
+
+        my_courses = self.client.get("/api/my-courses").data
+        resume = self.client.get("/api/courses/resume").data
+        self.assertCountEqual([item["id"] for item in my_courses], [first.id, second.id])
+        self.assertCountEqual([item["course_id"] for item in resume], [first.id, second.id])
+
+
+class DiscountCodeCacheTests(TestCase):
+    def setUp(self):
+        discounts._cache.clear()
+
+    def test_unknown_codes_do_not_grow_the_cache_without_bound(self):
+        with mock.patch.object(discounts, "DISCOUNT_CACHE_MAX_ENTRIES", 5):
+            for i in range(20):
+                with self.assertRaises(discounts.DiscountCodeError):
+                    discounts.resolve_discount_code(f"RANDOM{i}")
+            self.assertEqual(len(discounts._cache), 5)
+            # جدیدترین‌ها می‌مونن
+            self.assertEqual(list(discounts._cache), [f"RANDOM{i}" for i in range(15, 20)])
+
+
+class GenerateDiscountCodesCommandTests(TestCase):
+    def test_short_length_is_rejected_instead_of_looping_forever(self):
+        # با length=1 فقط ۳۲ کد ممکنه؛ قبلاً حلقه‌ی تولید هیچ‌وقت تموم نمی‌شد
+        with self.assertRaises(CommandError):
+            call_command("generate_discount_codes", "40", "--percent", "10", "--length", "1")
+        with self.assertRaises(CommandError):
+            call_command("generate_discount_codes", "1", "--percent", "10", "--length", "0")
+        self.assertFalse(DiscountCode.objects.exists())
+
+    def test_prefix_and_length_must_fit_the_code_field(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_discount_codes", "1", "--percent", "10", "--prefix", "P" * 45, "--length", "10")
+        self.assertFalse(DiscountCode.objects.exists())
+
+
+class _CountingView(APIView):
+    # هر اجرای واقعی handler شمرده می‌شه تا replay از اجرای دوباره جدا بشه
+    calls = 0
+    status_code = 200
+
+    @idempotent
+    def post(self, request):
+        _CountingView.calls += 1
+        return Response({"call": _CountingView.calls}, status=self.status_code)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        _CountingView.calls = 0
+        _CountingView.status_code = 200
+        self.user = User.objects.create_user(
+            username="retrier", email="retrier@example.com", password="pass"
+        )
+        self.factory = APIRequestFactory()
+
+    def _post(self, body):
+        request = self.factory.post(
+            "/api/checkout", body, format="json", HTTP_IDEMPOTENCY_KEY="key-1"
+        )
+        force_authenticate(request, user=self.user)
+        return _CountingView.as_view()(request)
+
+    def test_replay_returns_stored_response_without_running_again(self):
+        first = self._post({"a": 1})
+        second = self._post({"a": 1})
+        self.assertEqual(_CountingView.calls, 1)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self._post({"a": 1})
+        response = self._post({"a": 2})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(_CountingView.calls, 1)
+
+    def test_concurrent_retry_waits_for_the_first_request(self):
+        self._post({"a": 1})
+        # درخواست اول هنوز در حال اجراست؛ در اولین انتظار تموم می‌شه
+        record = IdempotencyKey.objects.get()
+        IdempotencyKey.objects.filter(pk=record.pk).update(is_completed=False)
+
+        def finish_first_request(_):
+            IdempotencyKey.objects.filter(pk=record.pk).update(is_completed=True)
+
+        with mock.patch("courses.idempotency.time.sleep", side_effect=finish_first_request):
+            response = self._post({"a": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"call": 1})
+        self.assertEqual(_CountingView.calls, 1)
+
+    def test_server_error_releases_the_key(self):
+        _CountingView.status_code = 500
+        self._post({"a": 1})
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        _CountingView.status_code = 200
+        response = self._post({"a": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_CountingView.calls, 2)
+
+    def test_abandoned_claim_is_taken_over_after_the_lease(self):
+        self._post({"a": 1})
+        # worker وسط درخواست کشته شده: ردیف ناتمام و قدیمی‌تر از lease
+        IdempotencyKey.objects.update(
+            is_completed=False,
+            created_at=timezone.now() - IDEMPOTENCY_LEASE - timedelta(seconds=1),
+        )
+        response = self._post({"a": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_CountingView.calls, 2)
+        self.assertTrue(IdempotencyKey.objects.get().is_completed)
+
+
+class CourseProgressTests(TestCase):
+    # سه سرفصل قابل پیگیری: ویدیو (۱)، چالش (۳) و ویدیو (۴)؛ سرفصل ۲ فقط کارت راهنما داره
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=10
+        )
+        sections = [
+            Section.objects.create(course=self.course, section_name=f"S{n}", order_number=n)
+            for n in range(1, 5)
+        ]
+        self.video = Content.objects.create(section=sections[0], content_type="video")
+        Content.objects.create(section=sections[1], content_type="guide_card")
+        self.challenge = Content.objects.create(
+            section=sections[2],
+            content_type="challenge",
+            challenge_data={"type": "multiple_choice_single", "correct_option": "a"},
+        )
+        Content.objects.create(section=sections[3], content_type="video")
+
+        self.user = User.objects.create_user(
+            username="student", email="student@example.com", password="pass"
+        )
+        UserProgress.objects.create(user=self.user, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _watch(self, seconds):
+        response = self.client.post(
+            f"/api/content/{self.video.id}/watch-progress",
+            {"watched_seconds": seconds, "total_seconds": 100},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def _answer(self, option):
+        response = self.client.post(
+            f"/api/challenges/{self.challenge.id}/submit", {"answers": [option]}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def _progress(self):
+        progress = UserProgress.objects.get(user=self.user, course=self.course)
+        return progress.completed_sections, progress.completion_percentage, progress.completed
+
+    def test_video_crossing_80_percent_completes_its_section(self):
+        self._watch(50)
+        self.assertEqual(self._progress(), (0, 0, False))
+        self._watch(80)
+        self.assertEqual(self._progress(), (1, 33, False))
+
+    def test_repeated_submissions_do_not_double_count(self):
+        self._watch(85)
+        self._watch(95)
+        self._answer("a")
+        self._answer("a")
+        self.assertEqual(self._progress(), (2, 67, False))
+
+    def test_passed_challenge_completes_its_section(self):
+        self._answer("a")
+        self.assertEqual(self._progress(), (1, 33, False))
+
+    def test_three_failed_attempts_reset_the_video_section(self):
+        self._watch(90)
+        self._answer("b")
+        self._answer("b")
+        self.assertEqual(self._progress(), (1, 33, False))
+        self._answer("b")
+        self.assertEqual(self._progress(), (0, 0, False))
+
+    def test_recompute_matches_incremental_progress(self):
+        self._watch(90)
+        self._answer("a")
+        expected = self._progress()
+        UserProgress.objects.update(completed_sections=0, completion_percentage=0)
+
+        recompute_progress_for_course(self.course.id)
+        self.assertEqual(self._progress(), expected)
+
+    def test_recompute_query_count_does_not_depend_on_learners(self):
+        # محتواها، ویدیوهای تکمیل‌شده، چالش‌های موفق، ردیف‌های پیشرفت و یک bulk_update
+        with self.assertNumQueries(5):
+            recompute_progress_for_course(self.course.id)
+        for i in range(10):
+            learner = User.objects.create_user(
+                username=f"learner{i}", email=f"learner{i}@example.com", password="pass"
+            )
+            UserProgress.objects.create(user=learner, course=self.course)
+        with self.assertNumQueries(5):
+            recompute_progress_for_course(self.course.id)
+
+
+class PaymentCallbackFlowTests(TestCase):
+    # صف callback → process_payment_events → سفارش paid یا failed
+    def setUp(self):
+        cache.clear()
+        discounts._cache.clear()
+        now = timezone.now()
+        self.discount = DiscountCode.objects.create(
+            code="SPRING",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+            max_redemptions=5,
+            per_user_limit=1,
+        )
+        self.course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=100
+        )
+        self.user = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="pass"
+        )
+        ShoppingCart.objects.create(user=self.user, course=self.course)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/checkout", {"discount_code": "SPRING"})
+        self.assertEqual(response.status_code, 200)
+        self.order = Order.objects.get(pk=response.data["order_id"])
+        self.gateway = APIClient()
+
+    def _callback(self, payload, signature):
+        return self.gateway.post(
+            "/api/payments/callback", payload, format="json", HTTP_X_GATEWAY_SIGNATURE=signature
+        )
+
+    def _process(self):
+        call_command("process_payment_events", stdout=StringIO())
+
+    def test_paid_callback_fulfils_the_order(self):
+        payload, signature = LocalGatewayStub().build_callback(self.order)
+        self.assertEqual(self._callback(payload, signature).status_code, 202)
+        self._process()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "paid")
+        self.assertTrue(UserProgress.objects.filter(user=self.user, course=self.course).exists())
+        self.assertEqual(PaymentEvent.objects.get().status, "processed")
+
+    def test_failed_callback_releases_the_discount_redemption(self):
+        self.discount.refresh_from_db()
+        self.assertEqual(self.discount.times_used, 1)
+
+        payload, signature = LocalGatewayStub().build_callback(self.order, "failed")
+        self._callback(payload, signature)
+        self._process()
+
+        self.order.refresh_from_db()
+        self.discount.refresh_from_db()
+        self.assertEqual(self.order.status, "failed")
+        self.assertEqual(self.discount.times_used, 0)
+        self.assertFalse(DiscountRedemption.objects.exists())
+        self.assertFalse(UserProgress.objects.filter(user=self.user).exists())
+
+    def test_amount_mismatch_is_rejected_by_the_worker(self):
+        payload, signature = LocalGatewayStub().build_callback(self.order, amount="1.00")
+        self._callback(payload, signature)
+        self._process()
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+        self.assertEqual(PaymentEvent.objects.get().status, "rejected")
+
+    def test_bad_signature_is_not_queued(self):
+        payload, _ = LocalGatewayStub().build_callback(self.order)
+        response = self._callback(payload, "forged")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_oversized_payload_is_not_queued(self):
+        payload, signature = LocalGatewayStub().build_callback(self.order)
+        payload["padding"] = "x" * MAX_CALLBACK_BODY_BYTES
+        response = self._callback(payload, signature)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+
+class OrderEventAckTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_user(
+            username="adminTeenComp", email="admin@example.com", password="pass"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        # دو رویداد order.created و order.paid
+        course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=10
+        )
+        ShoppingCart.objects.create(user=admin, course=course)
+        self.client.post("/api/simulate-payment")
+        self.latest = self.client.get("/api/admin/order-events").data["events"][-1]["id"]
+
+    def _ack(self, sequence):
+        return self.client.post(
+            "/api/admin/order-events/ack", {"consumer": "crm", "sequence": sequence}
+        )
+
+    def test_ack_up_to_the_latest_event(self):
+        response = self._ack(self.latest)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["last_sequence"], self.latest)
+
+    def test_ack_beyond_the_latest_event_is_rejected(self):
+        response = self._ack(self.latest + 100)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OrderEventConsumer.objects.filter(last_sequence__gt=self.latest).exists())
+
+    def test_ack_never_moves_the_cursor_back(self):
+        self._ack(self.latest)
+        response = self._ack(self.latest - 1)
+        self.assertEqual(response.data["last_sequence"], self.latest)
+
+
+class PrefetchNextSectionTests(TestCase):
+    # ویدیو (۱) و کارت راهنما (۱) → چالش (۲) → ویدیو (۳) → ویدیو (۴)
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=10
+        )
+        self.sections = {
+            n: Section.objects.create(course=self.course, section_name=f"S{n}", order_number=n)
+            for n in range(1, 5)
+        }
+        self.video = Content.objects.create(section=self.sections[1], content_type="video")
+        Content.objects.create(section=self.sections[1], content_type="guide_card")
+        Content.objects.create(
+            section=self.sections[2], content_type="challenge", challenge_data={}
+        )
+        Content.objects.create(section=self.sections[3], content_type="video")
+        Content.objects.create(section=self.sections[4], content_type="video")
+
+        self.user = User.objects.create_user(
+            username="viewer", email="viewer@example.com", password="pass"
+        )
+        UserProgress.objects.create(user=self.user, course=self.course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _check_next(self, prefetch):
+        return self.client.post(
+            "/api/sections/check-next-access",
+            {"current_section_id": self.sections[1].id, "prefetch_next": prefetch},
+            format="json",
+        )
+
+    def test_locked_section_is_not_embedded(self):
+        # کارت راهنما سرفصل ۲ رو باز می‌کنه ولی سرفصل ۳ هنوز قفله
+        response = self._check_next(True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data["next_section"])
+
+        response = self.client.get(
+            f"/api/courses/{self.course.id}/section/3/content?prefetch_next=1"
+        )
+        self.assertIsNone(response.data["next_section"])
+
+    def test_unlocked_section_is_embedded_without_extra_queries(self):
+        UserContentProgress.objects.create(user=self.user, content=self.video, is_completed=True)
+        self._check_next(False)  # کش دسترسی‌ها گرم بشه
+
+        with CaptureQueriesContext(connection) as without_prefetch:
+            self._check_next(False)
+        with CaptureQueriesContext(connection) as with_prefetch:
+            response = self._check_next(True)
+
+        self.assertEqual(response.data["next_section"]["section_order"], 3)
+        self.assertEqual(len(with_prefetch), len(without_prefetch))
+
+    def test_section_content_embeds_the_unlocked_next_section(self):
+        UserContentProgress.objects.create(user=self.user, content=self.video, is_completed=True)
+        response = self.client.get(
+            f"/api/courses/{self.course.id}/section/1/content?prefetch_next=1"
+        )
+        self.assertEqual(response.data["next_section"]["section_order"], 2)
+
+
+class PurchaseHistoryPagingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="pass"
+        )
+        course = Course.objects.create(
+            title="Course", description="-", instructor="-", duration_minutes=10, price=10
+        )
+        self.paid_ids = []
+        for i in range(5):
+            order = Order.objects.create(user=self.user, total_amount=10, status="paid")
+            OrderItem.objects.create(order=order, course=course)
+            self.paid_ids.append(order.id)
+        Order.objects.create(user=self.user, total_amount=10, status="pending")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walks_every_paid_order_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2} if cursor is None else {"limit": 2, "before": cursor}
+            response = self.client.get("/api/purchase-history", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["orders"]), 2)
+            seen.extend(order["order_id"] for order in response.data["orders"])
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, sorted(self.paid_ids, reverse=True))
+
+    def test_page_ending_exactly_at_the_last_order_has_no_cursor(self):
+        response = self.client.get("/api/purchase-history", {"limit": 5})
+        self.assertEqual(len(response.data["orders"]), 5)
+        self.assertIsNone(response.data["next_cursor"])
+        self.assertEqual(response.data["orders"][0]["items"][0]["course_title"], "Course")
+
+    def test_invalid_limit_is_rejected(self):
+        response = self.client.get("/api/purchase-history", {"limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+
+class PrerequisiteClosureTests(TestCase):
+    # A ← B ← C: برای B، دوره‌ی A پیش‌نیازه و برای C، دوره‌ی B
+    def setUp(self):
+        self.a, self.b, self.c = [
+            Course.objects.create(
+                title=title, description="-", instructor="-", duration_minutes=10, price=10
+            )
+            for title in ("A", "B", "C")
+        ]
+        add_prerequisite(self.b, self.a)
+        add_prerequisite(self.c, self.b)
+        self.user = User.objects.create_user(
+            username="student", email="student@example.com", password="pass"
+        )
+
+    def _ancestors(self, course):
+        return set(
+            CoursePrerequisiteClosure.objects.filter(course=course).values_list(
+                "ancestor_id", flat=True
+            )
+        )
+
+    def test_add_extends_the_closure_transitively(self):
+        self.assertEqual(self._ancestors(self.b), {self.a.id})
+        self.assertEqual(self._ancestors(self.c), {self.a.id, self.b.id})
+
+        # یال تکراری چیزی اضافه نمی‌کنه
+        _, created = add_prerequisite(self.c, self.b)
+        self.assertFalse(created)
+
+    def test_remove_rebuilds_the_closure_of_dependent_courses(self):
+        self.assertTrue(remove_prerequisite(self.b, self.a))
+        self.assertEqual(self._ancestors(self.b), set())
+        self.assertEqual(self._ancestors(self.c), {self.b.id})
+        self.assertFalse(remove_prerequisite(self.b, self.a))
+
+    def test_remove_keeps_ancestors_reachable_through_another_path(self):
+        add_prerequisite(self.c, self.a)
+        remove_prerequisite(self.b, self.a)
+        self.assertEqual(self._ancestors(self.c), {self.a.id, self.b.id})
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaises(PrerequisiteCycleError):
+            add_prerequisite(self.a, self.c)
+        with self.assertRaises(PrerequisiteCycleError):
+            add_prerequisite(self.a, self.a)
+        self.assertEqual(self._ancestors(self.a), set())
+
+        admin = User.objects.create_user(
+            username="adminTeenComp", email="admin@example.com", password="pass"
+        )
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.post(
+            f"/api/admin/courses/{self.a.id}/prerequisites", {"prerequisite_id": self.c.id}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_eligibility_follows_completed_prerequisites(self):
+        self.assertEqual(list(eligible_courses_for(self.user)), [self.a])
+        self.assertEqual(
+            missing_prerequisites_for(self.user, self.c), [(self.a, False), (self.b, False)]
+        )
+
+        UserProgress.objects.create(user=self.user, course=self.a, completed=True)
+        self.assertEqual(list(eligible_courses_for(self.user)), [self.b])
+        self.assertEqual(
+            missing_prerequisites_for(self.user, self.c), [(self.a, True), (self.b, False)]
+        )
+
+
+class RollupAllocationTests(TestCase):
+    def test_discounted_total_is_split_by_price(self):
+        shares = _allocate(Decimal("90.00"), [Decimal("10"), Decimal("20"), Decimal("60")])
+        self.assertEqual(shares, [Decimal("10.00"), Decimal("20.00"), Decimal("60.00")])
+
+        shares = _allocate(Decimal("81.00"), [Decimal("10"), Decimal("20"), Decimal("60")])
+        self.assertEqual(shares, [Decimal("9.00"), Decimal("18.00"), Decimal("54.00")])
+
+    def test_rounding_remainder_goes_to_the_last_item(self):
+        shares = _allocate(Decimal("10.00"), [Decimal("5")] * 3)
+        self.assertEqual(shares, [Decimal("3.33"), Decimal("3.33"), Decimal("3.34")])
+        self.assertEqual(sum(shares), Decimal("10.00"))
+
+    def test_free_courses_share_the_total_equally(self):
+        shares = _allocate(Decimal("1.00"), [Decimal("0"), Decimal("0")])
+        self.assertEqual(shares, [Decimal("0.50"), Decimal("0.50")])
+
+    def test_accumulate_groups_orders_by_day_and_course(self):
+        created_at = timezone.now()
+        rows = [
+            # (order_id, created_at, total, discount_code_id, course_id, price)
+            (1, created_at, Decimal("27.00"), 7, 10, Decimal("10")),
+            (1, created_at, Decimal("27.00"), 7, 11, Decimal("20")),
+            (2, created_at, Decimal("20.00"), None, 11, Decimal("20")),
+        ]
+        daily, per_course = accumulate_rollups(rows)
+
+        date = timezone.localtime(created_at).date()
+        self.assertEqual(daily[date], [2, Decimal("47.00"), 1])
+        self.assertEqual(per_course[(date, 10)], [1, Decimal("9.00"), 1])
+        self.assertEqual(per_course[(date, 11)], [2, Decimal("38.00"), 1])
+
+
+class CheckoutQuoteTests(TestCase):
+    # پیش‌فاکتور apply-discount فقط وقتی استفاده می‌شه که سبد عوض نشده باشه
+    def setUp(self):
+        cache.clear()
+        discounts._cache.clear()
+        now = timezone.now()
+        DiscountCode.objects.create(
+            code="SAVE10",
+            discount_percent=10,
+            valid_from=now - timedelta(days=1),
+            valid_to=now + timedelta(days=1),
+        )
+        self.user = User.objects.create_user(
+            username="shopper", email="shopper@example.com", password="pass"
+        )
+        self.courses = [
+            Course.objects.create(
+                title=f"Course {i}", description="-", instructor="-", duration_minutes=10, price=price
+            )
+            for i, price in enumerate((10, 20))
+        ]
+        for course in self.courses:
+            ShoppingCart.objects.create(user=self.user, course=course)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.quote = self.client.post("/api/apply-discount", {"code": "SAVE10"}).data["quote"]
+
+    def _checkout(self, **data):
+        response = self.client.post("/api/checkout", data)
+        self.assertEqual(response.status_code, 200)
+        return Order.objects.get(id=response.data["order_id"])
+
+    def test_quote_for_unchanged_cart_is_used(self):
+        order = self._checkout(quote=self.quote)
+        self.assertEqual(order.total_amount, Decimal("27.00"))
+        self.assertEqual(order.discount_code.code, "SAVE10")
+
+    def test_changed_cart_falls_back_to_recomputing(self):
+        extra = Course.objects.create(
+            title="Extra", description="-", instructor="-", duration_minutes=10, price=30
+        )
+        ShoppingCart.objects.create(user=self.user, course=extra)
+
+        order = self._checkout(quote=self.quote, discount_code="SAVE10")
+        self.assertEqual(order.total_amount, Decimal("54.00"))
+        self.assertEqual(order.items.count(), 3)
+
+    def test_changed_price_falls_back_to_recomputing(self):
+        Course.objects.filter(id=self.courses[0].id).update(price=40)
+
+        order = self._checkout(quote=self.quote)
+        # بدون کد تخفیف در درخواست، قیمت جدید بدون تخفیف حساب می‌شه
+        self.assertEqual(order.total_amount, Decimal("60.00"))
+        self.assertIsNone(order.discount_code)
+
+    def test_tampered_or_foreign_quote_is_ignored(self):
+        order = self._checkout(quote=self.quote[:-2] + "xx")
+        self.assertEqual(order.total_amount, Decimal("30.00"))
+
+        other = User.objects.create_user(
+            username="other", email="other@example.com", password="pass"
+        )
+        for course in self.courses:
+            ShoppingCart.objects.create(user=other, course=course)
+        self.client.force_authenticate(other)
+        order = self._checkout(quote=self.quote)
+        self.assertEqual(order.total_amount, Decimal("30.00"))
+        self.assertIsNone(order.discount_code)
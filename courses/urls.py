@@ -5,6 +5,8 @@ from .views import (
     AddToCartView,
     ViewCartView,
     RemoveFromCartView,
+    BulkAddToCartView,
+    BulkRemoveFromCartView,
     ApplyDiscountCodeView,
     CheckoutView,
     CreateCourseView,
@@ -29,6 +31,19 @@ from .views import (
     CheckNextSectionAccessView,
     GetCurrentSectionContent,
     SubmitChallengeView,
+    AddCoursePrerequisiteView,
+    DeleteCoursePrerequisiteView,
+    CoursePrerequisitesView,
+    EligibleCoursesView,
+    BulkCreateDiscountCodesView,
+    PaymentCallbackView,
+    LocalGatewayPayView,
+    OrderEventsView,
+    AcknowledgeOrderEventsView,
+    SalesReportView,
+    ExportCSVView,
+    CoursePlayerView,
+    ResumeLearningView,
 )
 
 urlpatterns = [
@@ -41,6 +56,12 @@ urlpatterns = [
         RemoveFromCartView.as_view(),
         name="remove_from_cart",
     ),
+    path("cart/bulk", BulkAddToCartView.as_view(), name="bulk_add_to_cart"),
+    path(
+        "remove-from-cart/bulk",
+        BulkRemoveFromCartView.as_view(),
+        name="bulk_remove_from_cart",
+    ),
     path("apply-discount", ApplyDiscountCodeView.as_view(), name="apply_discount"),
     path("checkout", CheckoutView.as_view(), name="checkout"),
     path("admin/courses", CreateCourseView.as_view(), name="create_course"),
@@ -133,4 +154,41 @@ urlpatterns = [
         SubmitChallengeView.as_view(),
         name="submit_challenge",
     ),
+    path(
+        "admin/courses/<int:course_id>/prerequisites",
+        AddCoursePrerequisiteView.as_view(),
+        name="add_course_prerequisite",
+    ),
+    path(
+        "admin/courses/<int:course_id>/prerequisites/<int:prerequisite_id>/delete",
+        DeleteCoursePrerequisiteView.as_view(),
+        name="delete_course_prerequisite",
+    ),
+    path(
+        "courses/<int:course_id>/prerequisites",
+        CoursePrerequisitesView.as_view(),
+        name="course_prerequisites",
+    ),
+    path("courses/eligible", EligibleCoursesView.as_view(), name="eligible_courses"),
+    path(
+        "admin/discount-codes/bulk",
+        BulkCreateDiscountCodesView.as_view(),
+        name="bulk_create_discount_codes",
+    ),
+    path("payments/callback", PaymentCallbackView.as_view(), name="payment_callback"),
+    path(
+        "payments/stub/<int:order_id>/pay",
+        LocalGatewayPayView.as_view(),
+        name="local_gateway_pay",
+    ),
+    path("admin/order-events", OrderEventsView.as_view(), name="order_events"),
+    path(
+        "admin/order-events/ack",
+        AcknowledgeOrderEventsView.as_view(),
+        name="acknowledge_order_events",
+    ),
+    path("admin/analytics/sales", SalesReportView.as_view(), name="sales_report"),
+    path("admin/exports/<str:dataset>.csv", ExportCSVView.as_view(), name="export_csv"),
+    path("courses/<int:course_id>/player", CoursePlayerView.as_view(), name="course_player"),
+    path("courses/resume", ResumeLearningView.as_view(), name="resume_learning"),
 ]
@@ -1,4 +1,48 @@
-from .models import Section,ChallengeAttempt
+import csv
+
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+
+from .models import Section,ChallengeAttempt,Content
+
+
+class _Echo:
+    # شبه‌فایل برای csv.writer که خط نوشته‌شده رو برمی‌گردونه به‌جای ذخیره
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    """
+    پاسخ CSV استریمی؛ rows می‌تونه هر iterable تنبلی باشه (مثلاً queryset.iterator())
+    پس حافظه ثابت می‌مونه و اولین بایت بلافاصله ارسال می‌شه.
+    """
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(generate(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+def sections_by_order(course_id, order_numbers):
+    """
+    سرفصل‌های چند order_number از یک دوره همراه با محتواهاشون (مرتب بر اساس id)،
+    با دو کوئری ثابت؛ برای اینکه محتوای سرفصل بعدی هم با همون کوئری سرفصل فعلی بیاد.
+    """
+    sections = Section.objects.filter(
+        course_id=course_id, order_number__in=order_numbers
+    ).prefetch_related(Prefetch("contents", queryset=Content.objects.order_by("id")))
+    return {section.order_number: section for section in sections}
+
+
+def wants_next_section(value):
+    # پارامتر prefetch_next از query string یا بدنه‌ی JSON
+    return value in (True, 1, "1", "true", "True")
+
 
 # def unlock_next_sections(user, from_section, num_sections=2):
 #     """
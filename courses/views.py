@@ -8,13 +8,16 @@ from .models import (
     Order,
     Section,
     Content,
-    UserProgress,
     OrderItem,
     UserContentProgress,
     ChallengeAttempt,
+    CourseRecommendation,
+    PaymentEvent,
+    OrderEventConsumer,
 )
 from .serializers import (
     CourseSerializer,
+    RecommendedCourseSerializer,
     AddToCartSerializer,
     CartItemSerializer,
     DiscountCodeSerializer,
@@ -27,7 +30,8 @@ from .serializers import (
     AdminCourseListSerializer,
     CourseOutlineSerializer,
     MyCourseSerializer,
-    PurchaseHistorySerializer,
+    PurchaseHistoryOrderSerializer,
+    PurchaseHistoryQuerySerializer,
     HomePageCourseSerializer,
     CourseSectionStatusSerializer,
     VideoProgressSerializer,
@@ -35,31 +39,129 @@ from .serializers import (
     ChallengeAttemptSummarySerializer,
     SectionContentSerializer,
     SubmitChallengeSerializer,
+    AddPrerequisiteSerializer,
+    BulkCartSerializer,
+    BulkDiscountCodeSerializer,
+    OrderEventsQuerySerializer,
+    OrderEventAckSerializer,
+    SalesReportQuerySerializer,
+    PrefetchedSectionSerializer,
 )
+from django.conf import settings
 from django.utils import timezone
 from accounts.models import User
-from django.db.models import Count, Q 
-from .utils import can_access_challenge
+from django.db import transaction
+from django.db.models import Count, F, Q, Prefetch
+from .utils import can_access_challenge, stream_csv, sections_by_order, wants_next_section
 from .ai_evaluator import evaluate_answer_with_ai
+from .cart import (
+    ANONYMOUS_CART_MAX_ITEMS,
+    cart_queryset,
+    get_cart,
+    apply_discount,
+    read_anonymous_cart,
+    save_anonymous_cart,
+    bulk_add_to_cart,
+    bulk_remove_from_cart,
+)
+from .discounts import redeem_discount_code, generate_discount_codes, DiscountCodeError
+from .fulfilment import fulfil_order, create_order_items
+from .entitlements import has_course_access
+from .analytics import record_paid_orders, sales_report, MAX_REPORT_DAYS
+from .exports import export_rows
+from .progress import (
+    annotate_course_progress,
+    record_progress,
+    recompute_progress_for_course,
+    latest_content_progress,
+)
+from .player import PlayerState, is_prefetched_section_unlocked
+from .payment_gateway import (
+    MAX_CALLBACK_BODY_BYTES,
+    SIGNATURE_HEADER,
+    LocalGatewayStub,
+    verify_signature,
+)
+from .outbox import (
+    order_event,
+    order_created_event,
+    record_order_events,
+    read_order_events,
+    acknowledge_order_events,
+    OrderEventSequenceError,
+    MAX_EVENTS_PER_PAGE,
+)
+from .idempotency import idempotent
+from .quotes import make_quote, QUOTE_MAX_AGE
+from .catalog import get_course_data, get_courses_data, MAX_BATCH_IDS
+from .prerequisites import (
+    PrerequisiteCycleError,
+    add_prerequisite,
+    remove_prerequisite,
+    eligible_courses_for,
+    missing_prerequisites_for,
+)
 
 class ListCoursesView(APIView):
     def get(self, request):
-        courses = Course.objects.all()
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        ids_param = request.query_params.get("ids")
+        if ids_param is None:
+            courses = Course.objects.all()
+            serializer = CourseSerializer(courses, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        # دریافت چند دوره با یک درخواست: courses?ids=1,2,3
+        try:
+            course_ids = [int(value) for value in ids_param.split(",") if value.strip()]
+        except ValueError:
+            return Response(
+                {"error": "ids must be a comma-separated list of integers."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # حذف تکراری‌ها با حفظ ترتیب درخواست
+        course_ids = list(dict.fromkeys(course_ids))
+        if not course_ids:
+            return Response(
+                {"error": "At least one course id is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(course_ids) > MAX_BATCH_IDS:
+            return Response(
+                {"error": f"At most {MAX_BATCH_IDS} course ids are allowed."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        courses_data = get_courses_data(course_ids)
+        return Response(
+            [courses_data[course_id] for course_id in course_ids if course_id in courses_data],
+            status=status.HTTP_200_OK,
+        )
 
 
 class CourseDetailsView(APIView):
     def get(self, request, course_id):
-        try:
-            course = Course.objects.get(id=course_id)
-            serializer = CourseSerializer(course)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Course.DoesNotExist:
+        course_data = get_course_data(course_id)
+        if course_data is None:
             return Response(
                 {"error": "Course not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
+        # «کسانی که این دوره رو خریدند این‌ها رو هم خریدند» — یک خواندن ایندکس‌شده
+        also_bought = (
+            CourseRecommendation.objects.filter(course_id=course_id)
+            .order_by("rank")
+            .values("recommended_course_id", "recommended_course__title",
+                    "recommended_course__price", "recommended_course__course_image")
+        )
+        return Response(
+            {
+                **course_data,
+                "also_bought": RecommendedCourseSerializer(also_bought, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
 
 class AddToCartView(APIView):
     def post(self, request):
@@ -67,78 +169,53 @@ class AddToCartView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        course_id = serializer.validated_data["course_id"]
-
-        # بررسی وجود دوره
-        try:
-            course = Course.objects.get(id=course_id)
-        except Course.DoesNotExist:
-            return Response(
-                {"error": "Course does not exist."}, status=status.HTTP_400_BAD_REQUEST
-            )
+        # وجود دوره در serializer چک شده
+        course = serializer.validated_data["course_id"]
 
         # کاربر لاگین شده؟
         if request.user.is_authenticated:
             cart_item, created = ShoppingCart.objects.get_or_create(
-                user=request.user, course_id=course_id, defaults={"session_token": None}
+                user=request.user, course=course, defaults={"session_token": None}
             )
             if not created:
                 return Response(
                     {"error": "Course is already in the cart."},
                     status=status.HTTP_409_CONFLICT,
                 )
+            cart_items, total_price = get_cart(request)
+            course_ids = None
         else:
-            # استفاده از session token
-            session_token = request.session.session_key
-            if not session_token:
-                request.session.save()
-                session_token = request.session.session_key
-
-            cart_item, created = ShoppingCart.objects.get_or_create(
-                session_token=session_token,
-                course_id=course_id,
-                defaults={"user": None},
-            )
-
-            if not created:
+            # سبد مهمان در کوکی امضاشده — بدون نوشتن در دیتابیس
+            course_ids = read_anonymous_cart(request)
+            if course.id in course_ids:
                 return Response(
                     {"error": "Course is already in the cart."},
                     status=status.HTTP_409_CONFLICT,
                 )
+            if len(course_ids) >= ANONYMOUS_CART_MAX_ITEMS:
+                return Response(
+                    {"error": "Your cart is full."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            course_ids.append(course.id)
+            cart_items, total_price = get_cart(request, anonymous_course_ids=course_ids)
 
         # لیست سبد خرید کاربر
-        cart_items = ShoppingCart.objects.filter(
-            user=request.user if request.user.is_authenticated else None,
-            session_token=session_token if not request.user.is_authenticated else None,
-        )
         cart_serializer = CartItemSerializer(cart_items, many=True)
-
-        return Response({"cart_items": cart_serializer.data}, status=status.HTTP_200_OK)
+        response = Response(
+            {"cart_items": cart_serializer.data, "total_price": total_price},
+            status=status.HTTP_200_OK,
+        )
+        if course_ids is not None:
+            save_anonymous_cart(response, course_ids)
+        return response
 
 
 class ViewCartView(APIView):
     def get(self, request):
-        cart_items = []
-
-        # کاربر لاگین شده
-        if request.user.is_authenticated:
-            cart_items = ShoppingCart.objects.filter(user=request.user)
-
-        # کاربر مهم نیست، از session استفاده می‌کنیم
-        else:
-            session_token = request.session.session_key
-            if not session_token:
-                request.session.save()
-                session_token = request.session.session_key
-
-            cart_items = ShoppingCart.objects.filter(session_token=session_token)
-
-        # سریالایز کردن داده‌ها
+        cart_items, total_price = get_cart(request)
         serializer = CartItemSerializer(cart_items, many=True)
 
-        # محاسبه قیمت کل
-        total_price = sum(item.course.price for item in cart_items)
-
         return Response(
             {"cart_items": serializer.data, "total_price": total_price},
             status=status.HTTP_200_OK,
@@ -149,47 +226,87 @@ class RemoveFromCartView(APIView):
     def delete(self, request, course_id):
         # بررسی وضعیت کاربر
         if request.user.is_authenticated:
-            try:
-                cart_item = ShoppingCart.objects.get(
-                    user=request.user, course_id=course_id
-                )
-                cart_item.delete()
-            except ShoppingCart.DoesNotExist:
+            deleted, _ = cart_queryset(request).filter(course_id=course_id).delete()
+            if not deleted:
                 return Response(
                     {"error": "Course not found in the cart."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
+            cart_items, total_price = get_cart(request)
+            course_ids = None
         else:
-            session_token = request.session.session_key
-            if not session_token:
-                return Response(
-                    {"error": "No active cart found for this session."},
-                    status=status.HTTP_404_NOT_FOUND,
-                )
-
-            try:
-                cart_item = ShoppingCart.objects.get(
-                    session_token=session_token, course_id=course_id
-                )
-                cart_item.delete()
-            except ShoppingCart.DoesNotExist:
+            course_ids = read_anonymous_cart(request)
+            if course_id not in course_ids:
                 return Response(
                     {"error": "Course not found in the cart."},
                     status=status.HTTP_404_NOT_FOUND,
                 )
+            course_ids.remove(course_id)
+            cart_items, total_price = get_cart(request, anonymous_course_ids=course_ids)
 
         # بازگرداندن سبد خرید جدید
-        cart_items = ShoppingCart.objects.filter(
-            user=request.user if request.user.is_authenticated else None,
-            session_token=session_token if not request.user.is_authenticated else None,
-        )
         serializer = CartItemSerializer(cart_items, many=True)
-        total_price = sum(item.course.price for item in cart_items)
-
-        return Response(
+        response = Response(
             {"cart_items": serializer.data, "total_price": total_price},
             status=status.HTTP_200_OK,
         )
+        if course_ids is not None:
+            save_anonymous_cart(response, course_ids)
+        return response
+
+
+class BulkAddToCartView(APIView):
+    def post(self, request):
+        serializer = BulkCartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        statuses, course_ids = bulk_add_to_cart(
+            request, serializer.validated_data["course_ids"]
+        )
+        cart_items, total_price = get_cart(request, anonymous_course_ids=course_ids)
+
+        response = Response(
+            {
+                "results": [
+                    {"course_id": course_id, "status": item_status}
+                    for course_id, item_status in statuses.items()
+                ],
+                "cart_items": CartItemSerializer(cart_items, many=True).data,
+                "total_price": total_price,
+            },
+            status=status.HTTP_200_OK,
+        )
+        if course_ids is not None:
+            save_anonymous_cart(response, course_ids)
+        return response
+
+
+class BulkRemoveFromCartView(APIView):
+    def post(self, request):
+        serializer = BulkCartSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        statuses, course_ids = bulk_remove_from_cart(
+            request, serializer.validated_data["course_ids"]
+        )
+        cart_items, total_price = get_cart(request, anonymous_course_ids=course_ids)
+
+        response = Response(
+            {
+                "results": [
+                    {"course_id": course_id, "status": item_status}
+                    for course_id, item_status in statuses.items()
+                ],
+                "cart_items": CartItemSerializer(cart_items, many=True).data,
+                "total_price": total_price,
+            },
+            status=status.HTTP_200_OK,
+        )
+        if course_ids is not None:
+            save_anonymous_cart(response, course_ids)
+        return response
 
 
 class ApplyDiscountCodeView(APIView):
@@ -198,28 +315,16 @@ class ApplyDiscountCodeView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        discount = serializer.validated_data
+        discount = serializer.validated_data["code"]
 
         # دریافت سبد خرید
-        if request.user.is_authenticated:
-            cart_items = ShoppingCart.objects.filter(user=request.user)
-        else:
-            session_token = request.session.session_key
-            if not session_token:
-                return Response(
-                    {"error": "No active cart found."}, status=status.HTTP_404_NOT_FOUND
-                )
-            cart_items = ShoppingCart.objects.filter(session_token=session_token)
-
-        if not cart_items.exists():
+        cart_items, total_price_before_discount = get_cart(request)
+        if not cart_items:
             return Response(
                 {"error": "Your cart is empty."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        total_price_before_discount = sum(item.course.price for item in cart_items)
-        total_price_after_discount = total_price_before_discount * (
-            1 - discount.discount_percent / 100
-        )
+        total_price_after_discount = apply_discount(total_price_before_discount, discount)
 
         return Response(
             {
@@ -227,38 +332,56 @@ class ApplyDiscountCodeView(APIView):
                 "discount_code": discount.code,
                 "total_price_before_discount": total_price_before_discount,
                 "total_price_after_discount": total_price_after_discount,
+                # پیش‌فاکتور امضاشده برای استفاده در checkout
+                "quote": make_quote(
+                    request.user, cart_items, discount, total_price_before_discount
+                ),
+                "quote_expires_in": QUOTE_MAX_AGE,
             },
             status=status.HTTP_200_OK,
         )
 
 
 class CheckoutView(APIView):
+    @idempotent
     def post(self, request):
+        # سبد مهمان بعد از لاگین با سبد کاربر ادغام می‌شه
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
         serializer = CheckoutSerializer(data=request.data, context={"request": request})
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_items = serializer.validated_data["cart_items"]
-        discount_code = serializer.validated_data.get("discount_code", None)
+        discount_code = serializer.validated_data.get("discount_code") or None
+        total_price = apply_discount(
+            serializer.validated_data["total_price"], discount_code
+        )
 
-        total_price = sum(item.course.price for item in cart_items)
-        if discount_code:
-            total_price = total_price * (1 - discount_code.discount_percent / 100)
+        try:
+            with transaction.atomic():
+                # ایجاد سفارش
+                order = Order.objects.create(
+                    user=request.user,
+                    total_amount=total_price,
+                    discount_code=discount_code,
+                )
+                if discount_code:
+                    redeem_discount_code(discount_code, request.user, order)
 
-        # ایجاد سفارش
-        order = Order.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            total_amount=total_price,
-            discount_code=discount_code,
-        )
+                # آیتم‌ها همین‌جا ثبت می‌شن چون سبد پاک می‌شه؛ دسترسی بعد از تأیید پرداخت داده می‌شه
+                create_order_items(order, serializer.validated_data["course_ids"])
+                record_order_events(
+                    [order_created_event(order, serializer.validated_data["course_ids"])]
+                )
 
-        # پاک کردن سبد خرید بعد از خرید
-        if request.user.is_authenticated:
-            ShoppingCart.objects.filter(user=request.user).delete()
-        else:
-            session_token = request.session.session_key
-            if session_token:
-                ShoppingCart.objects.filter(session_token=session_token).delete()
+                # پاک کردن سبد خرید بعد از خرید
+                cart_queryset(request).delete()
+        except DiscountCodeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # هدایت به درگاه پرداخت (در اینجا فقط یه URL می‌سازیم)
         payment_url = f"https://payment.gateway.example.com/transaction/ {order.id}"
@@ -324,6 +447,7 @@ class CheckoutView(APIView):
 
 
 class SimulatePaymentView(APIView):
+    @idempotent
     def post(self, request):
         if not request.user.is_authenticated:
             return Response(
@@ -331,43 +455,123 @@ class SimulatePaymentView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        cart_items = ShoppingCart.objects.filter(user=request.user).select_related(
-            "course"
-        )
-        if not cart_items.exists():
-            return Response(
-                {"error": "Your cart is empty."}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # محاسبه قیمت کل
-        total_price = sum(float(item.course.price) for item in cart_items)
+        # همه‌ی مراحل در یک تراکنش: یا سفارش با همه‌ی دسترسی‌ها ثبت می‌شه یا هیچی
+        with transaction.atomic():
+            cart_items, total_price = get_cart(request)
+            if not cart_items:
+                return Response(
+                    {"error": "Your cart is empty."}, status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # ایجاد سفارش با status='paid'
-        order = Order.objects.create(
-            user=request.user, total_amount=total_price, status="paid"
-        )
+            # ایجاد سفارش با status='paid'
+            order = Order.objects.create(
+                user=request.user, total_amount=total_price, status="paid"
+            )
 
-        # ایجاد OrderItem برای هر دوره
-        for item in cart_items:
-            OrderItem.objects.create(order=order, course=item.course)
-            # ایجاد دسترسی
-            UserProgress.objects.get_or_create(
-                user=request.user, course=item.course, defaults={"completed": False}
+            # ایجاد OrderItemها و دسترسی‌ها با bulk_create
+            course_ids = [item.course_id for item in cart_items]
+            fulfil_order(order, course_ids)
+            record_order_events(
+                [
+                    order_created_event(order, course_ids),
+                    order_event(
+                        "order.paid", order.id, order.user_id, order.total_amount, "paid"
+                    ),
+                ]
             )
+            record_paid_orders([order.id])
 
-        # پاک کردن سبد خرید
-        cart_items.delete()
+            # پاک کردن سبد خرید
+            cart_queryset(request).delete()
 
         return Response(
             {
                 "message": "Payment simulated successfully. Access granted and purchase history updated.",
                 "order_id": order.id,
-                "total_amount": total_price,
+                "total_amount": float(total_price),
             },
             status=status.HTTP_200_OK,
         )
 
 
+class PaymentCallbackView(APIView):
+    # درگاه پرداخت با JWT لاگین نمی‌کنه؛ امضا همین‌جا بررسی می‌شه تا بدنه‌ی جعلی در صف ننشینه.
+    # چک سفارش و مبلغ با process_payment_events انجام می‌شه.
+    authentication_classes = []
+
+    def post(self, request):
+        content_length = request.META.get("CONTENT_LENGTH") or 0
+        if (
+            not str(content_length).isdigit()
+            or int(content_length) > MAX_CALLBACK_BODY_BYTES
+            or len(request.body) > MAX_CALLBACK_BODY_BYTES
+        ):
+            return Response(
+                {"error": "Payload too large."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        event_id = request.data.get("event_id") if isinstance(request.data, dict) else None
+        if not event_id or not isinstance(event_id, str) or len(event_id) > 100:
+            return Response(
+                {"error": "event_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        signature = request.META.get(SIGNATURE_HEADER, "")
+        if not verify_signature(request.data, signature):
+            return Response(
+                {"error": "Invalid signature."}, status=status.HTTP_403_FORBIDDEN
+            )
+
+        # فقط یک INSERT؛ ساخت دسترسی‌ها و paid کردن سفارش با process_payment_events انجام می‌شه.
+        # callback تکراری درگاه (با همون event_id) نادیده گرفته می‌شه.
+        PaymentEvent.objects.bulk_create(
+            [
+                PaymentEvent(
+                    event_id=event_id,
+                    payload=request.data,
+                    signature=signature[:128],
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        return Response({"message": "Event accepted."}, status=status.HTTP_202_ACCEPTED)
+
+
+class LocalGatewayPayView(APIView):
+    """
+    درگاه ساختگی برای توسعه و تست: برای سفارش pending کاربر، callback امضاشده‌ی
+    پرداخت موفق رو در صف می‌ذاره. فقط در حالت DEBUG فعاله.
+    """
+
+    def post(self, request, order_id):
+        if not settings.DEBUG:
+            return Response({"error": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        order = Order.objects.filter(
+            id=order_id, user=request.user, status="pending"
+        ).first()
+        if order is None:
+            return Response(
+                {"error": "Pending order not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        payment_status = request.data.get("status", "paid")
+        payload, signature = LocalGatewayStub().build_callback(order, payment_status)
+        PaymentEvent.objects.create(
+            event_id=payload["event_id"], payload=payload, signature=signature
+        )
+        return Response(
+            {"event_id": payload["event_id"]}, status=status.HTTP_202_ACCEPTED
+        )
+
+
 class CreateCourseView(APIView):
     def post(self, request):
         # چک کردن احراز هویت
@@ -461,31 +665,49 @@ class UserPurchasedCoursesView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        if not User.objects.filter(id=user_id).exists():
             return Response(
                 {"error": "User not found."}, status=status.HTTP_404_NOT_FOUND
             )
 
-        # گرفتن تمام سفارش‌های paid شده
-        orders = Order.objects.filter(user=user, status="paid").select_related("course")
-        if not orders.exists():
-            return Response([], status=status.HTTP_200_OK)
+        query = PurchaseHistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        before = query.validated_data.get("before")
+        limit = query.validated_data["limit"]
+
+        # هر ردیف یک دوره‌ی خریداری‌شده (OrderItem) از سفارش‌های paid؛ صفحه‌بندی keyset
+        # روی id آیتم (جدیدترین اول) با ایندکس (user, status) روی Order
+        items = OrderItem.objects.filter(order__user_id=user_id, order__status="paid")
+        if before is not None:
+            items = items.filter(id__lt=before)
+        items = list(
+            items.select_related("order", "course")
+            .only("id", "order__created_at", "course__id", "course__title", "course__price")
+            .order_by("-id")[: limit + 1]
+        )
 
-        # گرفتن اطلاعات دوره‌های خریداری‌شده
-        purchased_courses = []
-        for order in orders:
-            purchased_courses.append(
+        has_more = len(items) > limit
+        items = items[:limit]
+        serializer = PurchasedCourseSerializer(
+            [
                 {
-                    "course_id": order.course.id,
-                    "title": order.course.title,
-                    "price": float(order.total_amount),
-                    "purchased_at": order.created_at,
+                    "course_id": item.course.id,
+                    "title": item.course.title,
+                    "price": item.course.price,
+                    "purchased_at": item.order.created_at,
                 }
-            )
-
-        return Response(purchased_courses, status=status.HTTP_200_OK)
+                for item in items
+            ],
+            many=True,
+        )
+        return Response(
+            {
+                "courses": serializer.data,
+                "next_cursor": items[-1].id if has_more else None,
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
 class CreateSectionView(APIView):
@@ -587,6 +809,7 @@ class DeleteSectionView(APIView):
             )
 
         section.delete()
+        recompute_progress_for_course(course.id)
         return Response(
             {"message": "Section deleted successfully."}, status=status.HTTP_200_OK
         )
@@ -646,6 +869,7 @@ class CreateContentView(APIView):
                     title=serializer.validated_data["title"],
                     video_url=serializer.validated_data["video_url"],
                 )
+                recompute_progress_for_course(course.id)
                 return Response(
                     VideoContentSerializer(content).data, status=status.HTTP_201_CREATED
                 )
@@ -660,6 +884,7 @@ class CreateContentView(APIView):
                     title=serializer.validated_data["title"],
                     guide_text=serializer.validated_data["guide_text"],
                 )
+                recompute_progress_for_course(course.id)
                 return Response(
                     GuideCardSerializer(content).data, status=status.HTTP_201_CREATED
                 )
@@ -674,6 +899,7 @@ class CreateContentView(APIView):
                     title=request.data.get("title"),
                     challenge_data=request.data.get("challenge_data"),
                 )
+                recompute_progress_for_course(course.id)
                 return Response(
                     ChallengeSerializer(content).data, status=status.HTTP_201_CREATED
                 )
@@ -794,6 +1020,7 @@ class DeleteContentBySectionView(APIView):
 
         # ۵. حذف محتوا
         content.delete()
+        recompute_progress_for_course(course.id)
         return Response(
             {"message": "Content deleted successfully."}, status=status.HTTP_200_OK
         )
@@ -839,8 +1066,10 @@ class MyCoursesView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
-        # گرفتن تمام دوره‌هایی که کاربر بهشون دسترسی داره
-        user_courses = Course.objects.filter(userprogress__user=request.user).distinct()
+        # دوره‌های کاربر همراه با پیشرفت ذخیره‌شده، در یک کوئری (join با UserProgress)
+        user_courses = annotate_course_progress(
+            Course.objects.all(), request.user
+        ).order_by("-progress_updated_at", "id")
 
         serializer = MyCourseSerializer(
             user_courses, many=True, context={"request": request}
@@ -856,14 +1085,41 @@ class PurchaseHistoryView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        # ✅ گرفتن OrderItems از طریق Orderهای paid
-        order_items = OrderItem.objects.filter(
-            order__user=request.user,
-            order__status='paid'
-        ).select_related('course')
+        query = PurchaseHistoryQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        before = query.validated_data.get("before")
+        limit = query.validated_data["limit"]
+
+        # صفحه‌بندی keyset روی id سفارش (جدیدترین اول): یک کوئری برای سفارش‌های صفحه
+        # و یک prefetch برای آیتم‌هاشون، فقط با ستون‌های لازم
+        orders = Order.objects.filter(user=request.user, status='paid')
+        if before is not None:
+            orders = orders.filter(id__lt=before)
+        orders = list(
+            orders.select_related('discount_code')
+            .only('id', 'created_at', 'total_amount', 'discount_code__code')
+            .prefetch_related(
+                Prefetch(
+                    'items',
+                    queryset=OrderItem.objects.select_related('course')
+                    .only('id', 'order_id', 'course_id', 'course__title', 'course__price')
+                    .order_by('id'),
+                )
+            )
+            .order_by('-id')[: limit + 1]
+        )
 
-        serializer = PurchaseHistorySerializer(order_items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        serializer = PurchaseHistoryOrderSerializer(orders, many=True)
+        return Response(
+            {
+                "orders": serializer.data,
+                "next_cursor": orders[-1].id if has_more else None,
+            },
+            status=status.HTTP_200_OK,
+        )
     
 class HomePageCoursesView(APIView):
     def get(self, request):
@@ -907,6 +1163,12 @@ class CourseSectionsStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        if not has_course_access(request.user, course.id):
+            return Response(
+                {"error": "You don't have access to this course."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         sections = Section.objects.filter(course=course).order_by('order_number')
         serializer = CourseSectionStatusSerializer(
             sections,
@@ -924,13 +1186,21 @@ class SubmitVideoProgressView(APIView):
             )
 
         try:
-            content = Content.objects.get(id=content_id, content_type='video')
+            content = Content.objects.select_related('section').get(
+                id=content_id, content_type='video'
+            )
         except Content.DoesNotExist:
             return Response(
                 {"error": "Video content not found or is not a video."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        if not has_course_access(request.user, content.section.course_id):
+            return Response(
+                {"error": "You don't have access to this course."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         watched_seconds = request.data.get("watched_seconds")
         total_seconds = request.data.get("total_seconds")
 
@@ -969,9 +1239,17 @@ class SubmitVideoProgressView(APIView):
         progress.total_duration = total_seconds
 
         # محاسبه تکمیل بودن (80%)
-        progress.is_completed = (watched_seconds / total_seconds) >= 0.8
+        is_completed = (watched_seconds / total_seconds) >= 0.8
 
-        progress.save()
+        if is_completed == progress.is_completed:
+            # is_completed نوشته نمی‌شه تا تغییر هم‌زمان یک درخواست دیگه رو برنگردونه
+            with record_progress(request.user, content):
+                progress.save(update_fields=["watched_duration", "total_duration", "updated_at"])
+        else:
+            # وضعیت تکمیل سرفصل زیر قفل UserProgress قبل و بعد از ذخیره مقایسه می‌شه
+            progress.is_completed = is_completed
+            with record_progress(request.user, content, [content.section_id]):
+                progress.save()
 
         # سریالایزر برای خروجی
         serializer = VideoProgressSerializer(progress)
@@ -1082,13 +1360,24 @@ class CheckNextSectionAccessView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # پیدا کردن سرفصل بعدی
-        try:
-            next_section = Section.objects.get(
-                course=current_section.course,
-                order_number=current_section.order_number + 1
+        if not has_course_access(request.user, current_section.course_id):
+            return Response(
+                {"error": "You don't have access to this course."},
+                status=status.HTTP_403_FORBIDDEN
             )
-        except Section.DoesNotExist:
+
+        # پیدا کردن سرفصل بعدی؛ سرفصل فعلی و سرفصل بعد از بعدی هم در همین کوئری میان تا در صورت
+        # درخواست (prefetch_next) محتوا و وضعیت قفل سرفصل بعد از بعدی بدون کوئری اضافه معلوم بشه
+        sections = sections_by_order(
+            current_section.course_id,
+            [
+                current_section.order_number,
+                current_section.order_number + 1,
+                current_section.order_number + 2,
+            ],
+        )
+        next_section = sections.get(current_section.order_number + 1)
+        if next_section is None:
             return Response({
                 "access_granted": False,
                 "message": "This is the last section."
@@ -1102,12 +1391,15 @@ class CheckNextSectionAccessView(APIView):
                 content=video_content
             )
             if progress.is_completed:
-                contents = Content.objects.filter(section=next_section)
+                contents = next_section.contents.all()
                 return Response({
                     "access_granted": True,
                     "message": "Access granted to next section (guide card).",
                     "content": ContentSerializer(contents, many=True).data,
-                    "challenge_attempts": None
+                    "challenge_attempts": None,
+                    **self._prefetch(
+                        request, sections, current_section, completed_video_ids=[video_content.id]
+                    ),
                 }, status=status.HTTP_200_OK)
         except:
             pass  # اگر ویدیو نبود یا پیشرفت نداشت، ادامه بده
@@ -1116,11 +1408,13 @@ class CheckNextSectionAccessView(APIView):
         try:
             guide_content = current_section.contents.get(content_type='guide_card')
             # اگر کاربر به این مرحله رسیده، فرض می‌کنیم کارت راهنما رو دیده
-            contents = Content.objects.filter(section=next_section)
+            contents = next_section.contents.all()
 
             # جمع‌آوری اطلاعات چالش (اگر وجود داشته باشه)
             challenge_attempts_data = None
-            challenge_content = contents.filter(content_type='challenge').first()
+            challenge_content = next(
+                (c for c in contents if c.content_type == 'challenge'), None
+            )
             if challenge_content:
                 attempts = ChallengeAttempt.objects.filter(
                     user=request.user,
@@ -1139,7 +1433,8 @@ class CheckNextSectionAccessView(APIView):
                 "access_granted": True,
                 "message": "Access granted to next section (challenge).",
                 "content": ContentSerializer(contents, many=True).data,
-                "challenge_attempts": challenge_attempts_data
+                "challenge_attempts": challenge_attempts_data,
+                **self._prefetch(request, sections, current_section),
             }, status=status.HTTP_200_OK)
         except:
             pass  # اگر کارت راهنما نبود، ادامه بده
@@ -1149,6 +1444,19 @@ class CheckNextSectionAccessView(APIView):
             "access_granted": False,
             "message": "You must complete the current section to proceed."
         }, status=status.HTTP_403_FORBIDDEN)
+
+    def _prefetch(self, request, sections, current_section, completed_video_ids=()):
+        # فقط بعد از دادن دسترسی صدا زده می‌شه؛ سرفصل قفل برای کاربر فرستاده نمی‌شه
+        if not wants_next_section(request.data.get("prefetch_next")):
+            return {}
+        following = sections.get(current_section.order_number + 2)
+        if following is not None and not is_prefetched_section_unlocked(
+            request.user, following, sections, completed_video_ids
+        ):
+            following = None
+        return {
+            "next_section": PrefetchedSectionSerializer(following).data if following else None
+        }
         
         
 class GetCurrentSectionContent(APIView):
@@ -1168,8 +1476,8 @@ class GetCurrentSectionContent(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # ۲. چک کردن دسترسی کاربر به دوره
-        if not UserProgress.objects.filter(user=request.user, course=course).exists():
+        # ۲. چک کردن دسترسی کاربر به دوره (از کش دسترسی‌ها)
+        if not has_course_access(request.user, course.id):
             return Response(
                 {"error": "You don't have access to this course."},
                 status=status.HTTP_403_FORBIDDEN
@@ -1184,28 +1492,43 @@ class GetCurrentSectionContent(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # ۴. گرفتن سرفصل با order_number مشخص
-        try:
-            section = Section.objects.get(
-                course=course,
-                order_number=current_section_order
-            )
-        except Section.DoesNotExist:
+        # ۴. گرفتن سرفصل با order_number مشخص؛ سرفصل قبلی و بعدی هم در همون کوئری میان تا
+        # محتوا و وضعیت قفل سرفصل بعدی (برای prefetch_next) بدون کوئری اضافه معلوم بشه
+        sections = sections_by_order(
+            course.id,
+            [current_section_order - 1, current_section_order, current_section_order + 1],
+        )
+        section = sections.get(current_section_order)
+        if section is None:
             return Response(
                 {"error": "Section with this order number not found in the course."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # ۵. گرفتن محتوای این سرفصل
-        contents = Content.objects.filter(section=section).order_by('id')
+        # ۵. گرفتن محتوای این سرفصل (از قبل prefetch شده)
+        contents = section.contents.all()
 
         # ۶. سریالایز و ارسال
         serializer = ContentSerializer(contents, many=True)
-        return Response({
+        data = {
             "section_order": current_section_order,
             "content_count": len(serializer.data),
             "content": serializer.data
-        }, status=status.HTTP_200_OK)
+        }
+
+        # ۷. محتوای سرفصل بعدی، اگر کلاینت خواسته باشه
+        if wants_next_section(request.query_params.get("prefetch_next")):
+            # سرفصل قفل برای کاربر فرستاده نمی‌شه
+            following = sections.get(current_section_order + 1)
+            if following is not None and not is_prefetched_section_unlocked(
+                request.user, following, sections
+            ):
+                following = None
+            data["next_section"] = (
+                PrefetchedSectionSerializer(following).data if following else None
+            )
+
+        return Response(data, status=status.HTTP_200_OK)
         
 # class SubmitChallengeView(APIView):
 #     def post(self, request, challenge_id):
@@ -1487,7 +1810,7 @@ class SubmitChallengeView(APIView):
             )
 
         try:
-            challenge_content = Content.objects.get(
+            challenge_content = Content.objects.select_related('section__course').get(
                 id=challenge_id,
                 content_type='challenge'
             )
@@ -1500,6 +1823,12 @@ class SubmitChallengeView(APIView):
         section = challenge_content.section
         course = section.course
 
+        if not has_course_access(request.user, course.id):
+            return Response(
+                {"error": "You don't have access to this course."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
         try:
             guide_section = Section.objects.get(
                 course=course,
@@ -1546,13 +1875,43 @@ class SubmitChallengeView(APIView):
             user=request.user,
             content=challenge_content
         ).count() + 1
+        attempts_exhausted = not is_correct and attempt_number >= 3
 
-        ChallengeAttempt.objects.create(
-            user=request.user,
-            content=challenge_content,
-            attempt_number=attempt_number,
-            is_successful=is_correct  # ✅ اینجا حتماً True یا False است
-        )
+        # اولین تلاش موفق ممکنه سرفصل چالش رو تکمیل کنه و ریست بعد از تلاش سوم
+        # ممکنه سرفصل ویدیو و چالش رو از حالت تکمیل خارج کنه
+        tracked_sections = None
+        if is_correct:
+            tracked_sections = [section.id]
+        elif attempts_exhausted:
+            tracked_sections = [section.id] + ([video_section.id] if video_section else [])
+
+        with record_progress(request.user, challenge_content, tracked_sections):
+            ChallengeAttempt.objects.create(
+                user=request.user,
+                content=challenge_content,
+                attempt_number=attempt_number,
+                is_successful=is_correct  # ✅ اینجا حتماً True یا False است
+            )
+
+            if attempts_exhausted:
+                # ریست ویدیو و حذف تلاش‌ها
+                if video_section:
+                    try:
+                        video_content = video_section.contents.get(content_type='video')
+                        UserContentProgress.objects.filter(
+                            user=request.user,
+                            content=video_content
+                        ).update(
+                            watched_duration=0,
+                            is_completed=False
+                        )
+                    except:
+                        pass
+
+                ChallengeAttempt.objects.filter(
+                    user=request.user,
+                    content=challenge_content
+                ).delete()
 
         # 🔹 اگر پاسخ درست بود
         if is_correct:
@@ -1567,25 +1926,7 @@ class SubmitChallengeView(APIView):
             }, status=status.HTTP_200_OK)
 
         # 🔹 اگر ۳ بار اشتباه جواب داده
-        if attempt_number >= 3:
-            if video_section:
-                try:
-                    video_content = video_section.contents.get(content_type='video')
-                    UserContentProgress.objects.filter(
-                        user=request.user,
-                        content=video_content
-                    ).update(
-                        watched_duration=0,
-                        is_completed=False
-                    )
-                except:
-                    pass
-
-            ChallengeAttempt.objects.filter(
-                user=request.user,
-                content=challenge_content
-            ).delete()
-
+        if attempts_exhausted:
             return Response({
                 "is_correct": False,
                 "message": "You've used all attempts. Review previous sections.",
@@ -1651,4 +1992,467 @@ class SubmitChallengeView(APIView):
                     return False
             return True
 
-        return False
\ No newline at end of file
+        return False
+
+class AddCoursePrerequisiteView(APIView):
+    def post(self, request, course_id):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        try:
+            course = Course.objects.get(id=course_id)
+        except Course.DoesNotExist:
+            return Response(
+                {"error": "Course not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = AddPrerequisiteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        prerequisite = serializer.validated_data["prerequisite_id"]
+        try:
+            _, created = add_prerequisite(course, prerequisite)
+        except PrerequisiteCycleError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not created:
+            return Response(
+                {"error": "This prerequisite already exists."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            {"course_id": course.id, "prerequisite_id": prerequisite.id},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class DeleteCoursePrerequisiteView(APIView):
+    def delete(self, request, course_id, prerequisite_id):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if not remove_prerequisite(
+            Course(id=course_id), Course(id=prerequisite_id)
+        ):
+            return Response(
+                {"error": "Prerequisite not found."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        return Response(
+            {"message": "Prerequisite removed successfully."}, status=status.HTTP_200_OK
+        )
+
+
+class CoursePrerequisitesView(APIView):
+    def get(self, request, course_id):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            course = Course.objects.get(id=course_id)
+        except Course.DoesNotExist:
+            return Response(
+                {"error": "Course not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        prerequisites = missing_prerequisites_for(request.user, course)
+        return Response({
+            "course_id": course.id,
+            "can_enroll": all(completed for _, completed in prerequisites),
+            "prerequisites": [
+                {
+                    "course_id": prerequisite.id,
+                    "title": prerequisite.title,
+                    "completed": completed,
+                }
+                for prerequisite, completed in prerequisites
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+class EligibleCoursesView(APIView):
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        courses = eligible_courses_for(request.user)
+        serializer = CourseSerializer(courses, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class BulkCreateDiscountCodesView(APIView):
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = BulkDiscountCodeSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = dict(serializer.validated_data)
+        codes = generate_discount_codes(
+            data.pop("count"), prefix=data.pop("prefix"), length=data.pop("length"), **data
+        )
+
+        # خروجی CSV استریمی از کدهای ساخته‌شده
+        return stream_csv(
+            "discount_codes.csv",
+            ["code", "discount_percent", "valid_from", "valid_to"],
+            (
+                [code, data["discount_percent"], data["valid_from"].isoformat(), data["valid_to"].isoformat()]
+                for code in codes
+            ),
+        )
+
+
+class OrderEventsView(APIView):
+    """
+    خواندن outbox رویدادهای سفارش با cursor: ?after=<sequence>&limit=N
+    اگر after داده نشه و consumer داده بشه، از آخرین sequence تأییدشده‌ی اون مصرف‌کننده ادامه می‌ده.
+    """
+
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = OrderEventsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        after = data.get("after")
+        if after is None:
+            consumer = data.get("consumer")
+            after = (
+                OrderEventConsumer.objects.filter(name=consumer)
+                .values_list("last_sequence", flat=True)
+                .first()
+                if consumer
+                else None
+            ) or 0
+
+        events = read_order_events(after, min(data["limit"], MAX_EVENTS_PER_PAGE))
+        return Response(
+            {
+                "events": events,
+                "next_after": events[-1]["id"] if events else after,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class AcknowledgeOrderEventsView(APIView):
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = OrderEventAckSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            last_sequence = acknowledge_order_events(
+                serializer.validated_data["consumer"], serializer.validated_data["sequence"]
+            )
+        except OrderEventSequenceError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {
+                "consumer": serializer.validated_data["consumer"],
+                "last_sequence": last_sequence,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class SalesReportView(APIView):
+    """
+    گزارش فروش بازه‌ی تاریخ: ?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    فقط از جدول‌های rollup خونده می‌شه و به Order/OrderItem دست نمی‌زنه.
+    """
+
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        serializer = SalesReportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        date_from = serializer.validated_data["date_from"]
+        date_to = serializer.validated_data["date_to"]
+        if date_to < date_from:
+            return Response(
+                {"error": "date_to must not be before date_from."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (date_to - date_from).days >= MAX_REPORT_DAYS:
+            return Response(
+                {"error": f"Date range cannot exceed {MAX_REPORT_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(sales_report(date_from, date_to), status=status.HTTP_200_OK)
+
+
+class ExportCSVView(APIView):
+    """
+    خروجی CSV استریمی برای ادمین: orders، users، content-progress، challenge-attempts
+    """
+
+    def get(self, request, dataset):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if request.user.username != "adminTeenComp":
+            return Response(
+                {"error": "You are not authorized to perform this action."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        export = export_rows(dataset)
+        if export is None:
+            return Response(
+                {"error": "Unknown export."}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        header, rows = export
+        return stream_csv(f"{dataset}.csv", header, rows)
+
+
+class CoursePlayerView(APIView):
+    """
+    وضعیت کامل player در یک درخواست: فهرست سرفصل‌ها، قفل هر سرفصل، محتوای سرفصل فعلی
+    و خلاصه‌ی تلاش‌های چالش. ?section=<order_number> سرفصل فعلی رو مشخص می‌کنه؛
+    بدون اون، آخرین سرفصلی که کاربر درش بوده برگردونده می‌شه.
+    """
+
+    def get(self, request, course_id):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            course = Course.objects.get(id=course_id)
+        except Course.DoesNotExist:
+            return Response(
+                {"error": "Course not found."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not has_course_access(request.user, course.id):
+            return Response(
+                {"error": "You don't have access to this course."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        section_order = request.query_params.get("section")
+        if section_order is not None and not section_order.isdigit():
+            return Response(
+                {"error": "Invalid section order number."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        state = PlayerState(request.user, course)
+        if section_order is not None:
+            current = state.section_by_order(int(section_order))
+            if current is None:
+                return Response(
+                    {"error": "Section with this order number not found in the course."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        else:
+            current = state.current_section()
+
+        current_data = None
+        if current is not None:
+            contents = list(current.contents.all())
+            challenges = state.contents_of(current, "challenge")
+            current_data = {
+                "id": current.id,
+                "section_name": current.section_name,
+                "order_number": current.order_number,
+                "is_unlocked": state.is_unlocked(current),
+                "content_count": len(contents),
+                "content": ContentSerializer(contents, many=True).data,
+                "challenge_attempts": (
+                    state.challenge_summary(challenges[0]) if challenges else None
+                ),
+            }
+
+        progress = state.progress
+        return Response({
+            "outline": {
+                "title": course.title,
+                "sections": [section.section_name for section in state.sections],
+            },
+            "sections": [
+                {
+                    "id": section.id,
+                    "section_name": section.section_name,
+                    "order_number": section.order_number,
+                    "is_unlocked": state.is_unlocked(section),
+                }
+                for section in state.sections
+            ],
+            "current_section": current_data,
+            "progress": {
+                "percentage": progress.completion_percentage if progress else 0,
+                "completed_sections": progress.completed_sections if progress else 0,
+                "last_visited_content_id": (
+                    progress.last_visited_content_id if progress else None
+                ),
+            },
+        }, status=status.HTTP_200_OK)
+
+
+class ResumeLearningView(APIView):
+    """
+    «ادامه از جایی که ماندی»: برای هر دوره‌ی کاربر آخرین محتوای دیده‌شده و پیشرفتش.
+    """
+
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return Response(
+                {"error": "Authentication required."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        # یک کوئری برای دوره‌ها و پیشرفت ذخیره‌شده، یک کوئری window برای آخرین محتوای هر دوره
+        courses = annotate_course_progress(
+            Course.objects.only("id", "title", "course_image"), request.user
+        ).annotate(
+            last_content_type=F("user_progress__last_visited_content__content_type"),
+            last_content_section_id=F("user_progress__last_visited_content__section_id"),
+            last_content_section_order=F(
+                "user_progress__last_visited_content__section__order_number"
+            ),
+        )
+        courses = list(courses)
+        latest = latest_content_progress(request.user, [course.id for course in courses])
+
+        results = []
+        for course in courses:
+            progress = latest.get(course.id)
+            # چالش‌ها ردیف UserContentProgress ندارن و فقط last_visited_content رو جابه‌جا می‌کنن؛
+            # هر کدوم جدیدتر باشه همون محتوای آخر حساب می‌شه
+            visited_is_newer = course.last_content_id is not None and (
+                progress is None
+                or progress.content_id == course.last_content_id
+                or course.progress_updated_at > progress.updated_at
+            )
+            if visited_is_newer:
+                watched = None
+                if progress and progress.content_id == course.last_content_id:
+                    watched = progress
+                last_content = {
+                    "id": course.last_content_id,
+                    "title": course.last_content_title,
+                    "content_type": course.last_content_type,
+                    "section_id": course.last_content_section_id,
+                    "section_order": course.last_content_section_order,
+                    "watched_duration": watched.watched_duration if watched else None,
+                    "total_duration": watched.total_duration if watched else None,
+                    "is_completed": watched.is_completed if watched else None,
+                    "updated_at": course.progress_updated_at,
+                }
+            elif progress:
+                last_content = {
+                    "id": progress.content_id,
+                    "title": progress.content.title,
+                    "content_type": progress.content.content_type,
+                    "section_id": progress.content.section_id,
+                    "section_order": progress.content.section.order_number,
+                    "watched_duration": progress.watched_duration,
+                    "total_duration": progress.total_duration,
+                    "is_completed": progress.is_completed,
+                    "updated_at": progress.updated_at,
+                }
+            else:
+                last_content = None
+
+            results.append({
+                "course_id": course.id,
+                "title": course.title,
+                "course_image": course.course_image,
+                "percentage": course.completion_percentage,
+                "last_content": last_content,
+            })
+
+        # دوره‌هایی که اخیراً دیده شدن اول، بعد دوره‌های شروع‌نشده
+        results.sort(
+            key=lambda item: (
+                item["last_content"] is None,
+                -(item["last_content"]["updated_at"].timestamp() if item["last_content"] else 0),
+                item["course_id"],
+            )
+        )
+        return Response(results, status=status.HTTP_200_OK)